@@ -6,7 +6,8 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # Imported through LazyModule, which PyInstaller's import scan cannot follow
+    hiddenimports=['pandas', 'numpy', 'tkinter', 'tkinter.ttk', 'matplotlib.figure', 'matplotlib.backends.backend_tkagg'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
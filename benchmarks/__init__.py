@@ -0,0 +1 @@
+"""Synthetic data generation and benchmarks for Browser Time Analyzer."""
@@ -0,0 +1,183 @@
+"""Generate synthetic Chromium History databases for benchmarking.
+
+Creates a fake User Data folder with a Local State file and one History
+database per profile, using the same urls/visits schema as Chromium:
+
+    python -m benchmarks.generate_history --output bench_data --profiles 4 --visits 1000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# Microseconds between the Chrome epoch (1601-01-01) and the Unix epoch
+CHROME_EPOCH_OFFSET = 11644473600 * 1000000
+
+HISTORY_SCHEMA = """
+CREATE TABLE meta(key LONGVARCHAR NOT NULL UNIQUE PRIMARY KEY, value LONGVARCHAR);
+CREATE TABLE urls(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url LONGVARCHAR,
+    title LONGVARCHAR,
+    visit_count INTEGER DEFAULT 0 NOT NULL,
+    typed_count INTEGER DEFAULT 0 NOT NULL,
+    last_visit_time INTEGER NOT NULL,
+    hidden INTEGER DEFAULT 0 NOT NULL
+);
+CREATE TABLE visits(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url INTEGER NOT NULL,
+    visit_time INTEGER NOT NULL,
+    from_visit INTEGER,
+    transition INTEGER DEFAULT 0 NOT NULL,
+    segment_id INTEGER,
+    visit_duration INTEGER DEFAULT 0 NOT NULL,
+    incremented_omnibox_typed_score BOOLEAN DEFAULT FALSE NOT NULL
+);
+"""
+
+# Created after the bulk insert, which is much faster than maintaining them row by row
+HISTORY_INDEXES = """
+CREATE INDEX urls_url_index ON urls (url);
+CREATE INDEX visits_url_index ON visits (url);
+CREATE INDEX visits_from_index ON visits (from_visit);
+CREATE INDEX visits_time_index ON visits (visit_time);
+"""
+
+# Share of visits per hour of the day, roughly following a working day
+HOUR_WEIGHTS = np.array([
+    1, 1, 1, 1, 1, 2, 4, 8, 14, 16, 16, 14,
+    10, 14, 16, 16, 14, 10, 8, 8, 7, 5, 3, 2
+], dtype=float)
+
+BATCH_SIZE = 500000
+
+def zipf_weights(n, exponent):
+    """Popularity weights for n items following a Zipf distribution"""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def generate_profile(path, visits, urls, domains, days, exponent, rng, end_time=None):
+    """Write one History database with the given number of visits"""
+    if os.path.exists(path):
+        os.remove(path)
+    end_time = end_time or time.time()
+    end_us = int(end_time * 1000000) + CHROME_EPOCH_OFFSET
+    start_us = end_us - days * 86400 * 1000000
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(HISTORY_SCHEMA)
+        conn.execute("INSERT INTO meta VALUES ('version', '67')")
+
+        # Each URL belongs to a domain picked by popularity, and URLs are in
+        # turn visited by popularity, so a few sites dominate like real history
+        url_domains = rng.choice(domains, size=urls, p=zipf_weights(domains, exponent))
+        conn.executemany(
+            "INSERT INTO urls (id, url, title, last_visit_time) VALUES (?, ?, ?, ?)",
+            (
+                (i + 1, f"https://{'www.' if i % 3 else ''}site{d}.example.com/page/{i}?ref={i % 7}",
+                 f"Page {i} on site {d}", end_us)
+                for i, d in enumerate(url_domains.tolist())
+            )
+        )
+
+        url_weights = zipf_weights(urls, exponent)
+        hour_weights = HOUR_WEIGHTS / HOUR_WEIGHTS.sum()
+        # Batches cover consecutive slices of the time range and are sorted,
+        # so visit ids grow with visit_time as they do in a real browser
+        batches = -(-visits // BATCH_SIZE)
+        next_id = 1
+        remaining = visits
+        for batch in range(batches):
+            n = min(BATCH_SIZE, remaining)
+            first_day = days * batch // batches
+            last_day = max(first_day + 1, days * (batch + 1) // batches)
+            day = rng.integers(first_day, last_day, size=n)
+            hour = rng.choice(24, size=n, p=hour_weights)
+            offset = rng.integers(0, 3600 * 1000000, size=n)
+            visit_time = start_us + (day * 24 + hour) * 3600 * 1000000 + offset
+            visit_time = np.sort(np.minimum(visit_time, end_us))
+            url_ids = rng.choice(urls, size=n, p=url_weights) + 1
+            # Most visits are short, a few tabs stay open for hours, and
+            # some never got a duration written
+            duration = rng.lognormal(mean=17.0, sigma=1.8, size=n).astype(np.int64)
+            duration[rng.random(n) < 0.15] = 0
+            transition = rng.choice([0, 1, 805306368, 838860801], size=n)
+
+            ids = np.arange(next_id, next_id + n)
+            conn.executemany(
+                "INSERT INTO visits (id, url, visit_time, transition, visit_duration) VALUES (?, ?, ?, ?, ?)",
+                zip(ids.tolist(), url_ids.tolist(), visit_time.tolist(),
+                    transition.tolist(), duration.tolist())
+            )
+            next_id += n
+            remaining -= n
+
+        conn.executescript(HISTORY_INDEXES)
+        conn.execute(
+            "UPDATE urls SET visit_count = (SELECT COUNT(*) FROM visits WHERE visits.url = urls.id)"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def generate_user_data(output, profiles=3, visits=100000, urls=20000, domains=2000,
+                       days=365, exponent=1.1, seed=0, end_time=None):
+    """Create a fake User Data folder with Local State and a History file per profile.
+
+    Returns the list of profile directory names that were written.
+    """
+    os.makedirs(output, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    profile_dirs = ['Default'] + [f"Profile {i}" for i in range(1, profiles)]
+    info_cache = {}
+    for i, profile_dir in enumerate(profile_dirs):
+        directory = os.path.join(output, profile_dir)
+        os.makedirs(directory, exist_ok=True)
+        # Spread the visits unevenly so profiles get different billing shares
+        profile_visits = max(1, int(visits * (1.0 - 0.5 * i / max(1, profiles))))
+        generate_profile(
+            os.path.join(directory, 'History'), profile_visits, urls, domains,
+            days, exponent, rng, end_time
+        )
+        info_cache[profile_dir] = {'name': f"Client {chr(ord('A') + i % 26)}"}
+
+    with open(os.path.join(output, 'Local State'), 'w', encoding='utf-8') as f:
+        json.dump({'profile': {'info_cache': info_cache}}, f, indent=2)
+    return profile_dirs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Chromium History databases.")
+    parser.add_argument('--output', default='bench_data',
+                        help="User Data folder to create (default: bench_data)")
+    parser.add_argument('--profiles', type=int, default=3,
+                        help="number of profiles, the first one is Default (default: 3)")
+    parser.add_argument('--visits', type=int, default=100000,
+                        help="visits in the largest profile (default: 100000)")
+    parser.add_argument('--urls', type=int, default=20000,
+                        help="distinct URLs per profile (default: 20000)")
+    parser.add_argument('--domains', type=int, default=2000,
+                        help="distinct domains (default: 2000)")
+    parser.add_argument('--days', type=int, default=365,
+                        help="days of history ending now (default: 365)")
+    parser.add_argument('--zipf', type=float, default=1.1,
+                        help="Zipf exponent for domain and URL popularity (default: 1.1)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    profile_dirs = generate_user_data(
+        args.output, args.profiles, args.visits, args.urls, args.domains,
+        args.days, args.zipf, args.seed
+    )
+    print(f"Wrote {len(profile_dirs)} profiles to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+    main()
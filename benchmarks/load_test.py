@@ -0,0 +1,143 @@
+"""Load test the report service with concurrent clients.
+
+Starts a service on synthetic history (or an existing User Data folder) in
+this process, unless --url points at one that is already running:
+
+    python -m benchmarks.load_test --clients 16 --requests 200
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 --clients 32
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from benchmarks.generate_history import generate_user_data
+from src.main import BrowserHistoryAnalyzer, ReportService, create_report_server
+
+QUERIES = [
+    '/report?week=0',
+    '/report?week=1',
+    '/report?week=0&time_model=interval',
+    '/top-sites?week=0&n=10',
+    '/top-sites?week=1&n=25',
+    '/billing?week=0',
+    '/billing?week=1',
+    '/status',
+]
+
+def start_service(data_dir, refresh_interval):
+    """Start a ReportService on a free localhost port; returns (service, server, base url)"""
+    analyzer = BrowserHistoryAnalyzer(use_cache=False)
+    analyzer.set_browser('Chrome', data_dir)
+    service = ReportService(analyzer, refresh_interval=refresh_interval)
+    started = time.perf_counter()
+    service.start()
+    print(f"Loaded {len(analyzer.profiles)} profiles in {time.perf_counter() - started:.2f}s")
+
+    server = create_report_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return service, server, f"http://127.0.0.1:{server.server_port}"
+
+def run_client(base_url, requests, offset, latencies, errors):
+    """Send requests over one keep-alive connection, cycling through QUERIES"""
+    url = urlparse(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    try:
+        for i in range(requests):
+            path = QUERIES[(offset + i) % len(QUERIES)]
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors.append(path)
+                conn.close()
+                conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status >= 500:
+                errors.append(path)
+    finally:
+        conn.close()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Browser Time Analyzer report service.")
+    parser.add_argument('--url', help="base URL of a running service; one is started when omitted")
+    parser.add_argument('--data-dir',
+                        help="existing User Data folder to serve; generated when omitted")
+    parser.add_argument('--profiles', type=int, default=3)
+    parser.add_argument('--visits', type=int, default=200000,
+                        help="visits in the largest generated profile (default: 200000)")
+    parser.add_argument('--clients', type=int, default=16,
+                        help="concurrent clients (default: 16)")
+    parser.add_argument('--requests', type=int, default=200,
+                        help="requests per client (default: 200)")
+    parser.add_argument('--refresh-interval', type=float, default=5,
+                        help="background refresh interval of the started service (default: 5)")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bta_load_') as work_dir:
+        service = server = None
+        base_url = args.url
+        if base_url is None:
+            data_dir = args.data_dir
+            if data_dir is None:
+                data_dir = os.path.join(work_dir, 'User Data')
+                print(f"Generating {args.profiles} profiles with up to {args.visits} visits...")
+                generate_user_data(data_dir, profiles=args.profiles, visits=args.visits)
+            service, server, base_url = start_service(data_dir, args.refresh_interval)
+
+        latencies = []
+        errors = []
+        clients = [
+            threading.Thread(target=run_client, args=(base_url, args.requests, i, latencies, errors))
+            for i in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - started
+
+        if server is not None:
+            service.stop()
+            server.shutdown()
+            server.server_close()
+
+    results = {
+        'clients': args.clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0,
+    }
+    if latencies:
+        results.update({
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': max(latencies) * 1000,
+        })
+    for name, value in results.items():
+        print(f"{name:<22}{value:>12.1f}" if isinstance(value, float) else f"{name:<22}{value:>12}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
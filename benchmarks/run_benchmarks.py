@@ -0,0 +1,183 @@
+"""Benchmark the analysis pipeline stage by stage on synthetic history.
+
+Reports wall time (median of --repeat runs) and peak traced memory (from one
+extra run under tracemalloc) for each stage:
+
+    python -m benchmarks.run_benchmarks --visits 1000000 --json results.json
+    python -m benchmarks.run_benchmarks --visits 1000000 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.generate_history import generate_user_data
+from src.main import BrowserHistoryAnalyzer
+
+class Stage:
+    def __init__(self, name, func, setup=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+def measure(stage, repeat):
+    """Return (median wall seconds, peak traced bytes) for a stage"""
+    walls = []
+    for _ in range(repeat):
+        if stage.setup:
+            stage.setup()
+        started = time.perf_counter()
+        stage.func()
+        walls.append(time.perf_counter() - started)
+
+    # Memory is measured separately because tracemalloc slows the run down
+    if stage.setup:
+        stage.setup()
+    tracemalloc.start()
+    try:
+        stage.func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(walls), peak
+
+def build_stages(data_dir, cache_dir, week_offset):
+    """Create the pipeline stages, each with a setup that puts the analyzer in the right state"""
+    analyzer = BrowserHistoryAnalyzer(use_cache=False)
+    analyzer.set_browser('Chrome', data_dir)
+    cached = BrowserHistoryAnalyzer(cache_path=os.path.join(cache_dir, 'visit_cache.db'))
+    cached.set_browser('Chrome', data_dir)
+    first_profile = analyzer.profiles[0]
+
+    def ensure_loaded():
+        if not analyzer.history_data:
+            analyzer.analyze_all_profiles()
+
+    def cold_reports():
+        ensure_loaded()
+        analyzer.invalidate_reports()
+        analyzer.report_source = 'memory'
+
+    def sql_reports():
+        analyzer.invalidate_reports()
+        analyzer.report_source = 'sql'
+
+    def warm_reports():
+        ensure_loaded()
+        analyzer.report_source = 'memory'
+        analyzer.generate_time_report(week_offset, analyzer.excluded_profiles)
+        analyzer.generate_time_report(week_offset)
+
+    def reset_cache():
+        cached.visit_cache.reset('Chrome', first_profile)
+
+    def forget_file_stats():
+        # Otherwise every run after the first skips the unchanged profiles
+        analyzer.file_stats.clear()
+
+    stages = [
+        Stage('connect_to_db', lambda: close_db(analyzer, first_profile)),
+        Stage('analyze_profile', lambda: analyzer.analyze_profile(first_profile)),
+        Stage('analyze_profile (cache cold)', lambda: cached.analyze_profile(first_profile), reset_cache),
+        Stage('analyze_profile (cache warm)', lambda: cached.analyze_profile(first_profile)),
+        Stage('analyze_all_profiles', analyzer.analyze_all_profiles, forget_file_stats),
+        Stage('analyze_all_profiles (unchanged)', analyzer.analyze_all_profiles, ensure_loaded),
+        Stage('generate_time_report', lambda: analyzer.generate_time_report(week_offset), cold_reports),
+        Stage('generate_time_report (sql)', lambda: analyzer.generate_time_report(week_offset), sql_reports),
+        Stage('generate_time_report (memoized)', lambda: analyzer.generate_time_report(week_offset), warm_reports),
+        Stage('calculate_billing_distribution',
+              lambda: analyzer.calculate_billing_distribution(week_offset), cold_reports),
+        Stage('generate_trend_report', lambda: analyzer.generate_trend_report(range(52)), cold_reports),
+    ]
+
+    try:
+        import matplotlib  # noqa: F401
+        matplotlib.use('Agg')
+        stages += [
+            Stage('create_top_sites_plot', lambda: analyzer.create_top_sites_plot(week_offset=week_offset),
+                  cold_reports),
+            Stage('create_profile_usage_plot',
+                  lambda: analyzer.create_profile_usage_plot(week_offset=week_offset), cold_reports),
+        ]
+    except ImportError:
+        print("matplotlib is not installed, skipping plot stages")
+    return stages
+
+def close_db(analyzer, profile):
+    conn, temp_db = analyzer.connect_to_db(analyzer.get_profile_path(profile))
+    conn.execute("SELECT COUNT(*) FROM visits").fetchone()
+    conn.close()
+    analyzer.cleanup_temp_db(temp_db)
+
+def format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f"{n:.1f} {unit}"
+        n /= 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Browser Time Analyzer pipeline stages.")
+    parser.add_argument('--data-dir',
+                        help="existing User Data folder to benchmark; generated when omitted")
+    parser.add_argument('--profiles', type=int, default=3)
+    parser.add_argument('--visits', type=int, default=200000,
+                        help="visits in the largest generated profile (default: 200000)")
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--week-offset', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs per stage, the median is reported (default: 3)")
+    parser.add_argument('--stage', action='append', default=[],
+                        help="only run stages whose name starts with this; repeatable")
+    parser.add_argument('--json', help="write results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bta_bench_') as work_dir:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = os.path.join(work_dir, 'User Data')
+            print(f"Generating {args.profiles} profiles with up to {args.visits} visits...")
+            generate_user_data(data_dir, profiles=args.profiles, visits=args.visits,
+                               days=args.days, seed=args.seed)
+
+        stages = build_stages(data_dir, work_dir, args.week_offset)
+        if args.stage:
+            stages = [s for s in stages if any(s.name.startswith(prefix) for prefix in args.stage)]
+
+        baseline = {}
+        if args.compare:
+            with open(args.compare, encoding='utf-8') as f:
+                baseline = {r['stage']: r for r in json.load(f)['results']}
+
+        results = []
+        print(f"{'stage':<34}{'wall':>12}{'peak memory':>14}{'vs baseline':>14}")
+        for stage in stages:
+            wall, peak = measure(stage, args.repeat)
+            results.append({'stage': stage.name, 'wall_seconds': wall, 'peak_bytes': peak})
+            change = ''
+            if stage.name in baseline and baseline[stage.name]['wall_seconds'] > 0:
+                change = f"{wall / baseline[stage.name]['wall_seconds'] - 1:+.0%}"
+            print(f"{stage.name:<34}{wall * 1000:>10.1f}ms{format_bytes(peak):>14}{change:>14}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'profiles': args.profiles,
+                'visits': args.visits,
+                'data_dir': args.data_dir,
+                'results': results,
+            }, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == '__main__':
+    main()
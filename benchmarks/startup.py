@@ -0,0 +1,127 @@
+"""Measure startup time of the source and frozen builds.
+
+For the GUI, reports time to window (the main window is first mapped) and
+time to first report (the first analysis is shown), both from process
+launch. Headless runs report the time until the report files are written.
+Every run uses a fresh home directory with generated Chrome history, so the
+visit cache is cold:
+
+    python -m benchmarks.startup --repeat 5
+    python -m benchmarks.startup --exe "dist/Browser Time Analyzer.exe" --json startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate_history import generate_user_data
+from src.main import BrowserHistoryAnalyzer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Where build.py and the .spec file leave the PyInstaller build
+FROZEN_CANDIDATES = [
+    os.path.join(ROOT, 'dist', 'Browser Time Analyzer.exe'),
+    os.path.join(ROOT, 'dist', 'main.exe'),
+    os.path.join(ROOT, 'dist', 'Browser Time Analyzer'),
+    os.path.join(ROOT, 'dist', 'main'),
+]
+
+def make_home(work_dir, template):
+    """Create a home directory holding a copy of the template Chrome User Data folder"""
+    home = tempfile.mkdtemp(dir=work_dir)
+    shutil.copytree(template, os.path.join(home, BrowserHistoryAnalyzer.BROWSER_PATHS['Chrome']['path']))
+    return home
+
+def run_once(command, mode, work_dir, template, timeout):
+    """Launch one process in a fresh home; returns {metric: seconds since launch}"""
+    home = make_home(work_dir, template)
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    probe = os.path.join(home, 'probe.json')
+    if mode == 'gui':
+        args = ['--startup-probe', probe, '--browser', 'Chrome']
+    else:
+        args = ['--headless', '--browser', 'Chrome', '--output-dir', os.path.join(home, 'out')]
+
+    started = time.time()
+    result = subprocess.run(command + args, env=env, capture_output=True, text=True, timeout=timeout)
+    finished = time.time()
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip()
+                           else f"exit code {result.returncode}")
+    if mode == 'headless':
+        return {'first_report': finished - started}
+    with open(probe, encoding='utf-8') as f:
+        times = json.load(f)
+    return {name: value - started for name, value in times.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Browser Time Analyzer startup time.")
+    parser.add_argument('--exe', help="frozen build to measure; looked for in dist/ when omitted")
+    parser.add_argument('--profiles', type=int, default=3)
+    parser.add_argument('--visits', type=int, default=20000,
+                        help="visits in the largest generated profile (default: 20000)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="launches per build and mode, the median is reported (default: 3)")
+    parser.add_argument('--mode', choices=['gui', 'headless'], action='append',
+                        help="modes to measure; repeatable (default: both)")
+    parser.add_argument('--timeout', type=float, default=300,
+                        help="seconds before a launch is abandoned (default: 300)")
+    parser.add_argument('--json', help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    builds = [('source', [sys.executable, os.path.join(ROOT, 'src', 'main.py')])]
+    exe = args.exe or next((path for path in FROZEN_CANDIDATES if os.path.isfile(path)), None)
+    if exe:
+        builds.append(('frozen', [exe]))
+    else:
+        print("No frozen build found, run build.py or pass --exe to include it")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bta_startup_') as work_dir:
+        template = os.path.join(work_dir, 'User Data')
+        print(f"Generating {args.profiles} profiles with up to {args.visits} visits...")
+        generate_user_data(template, profiles=args.profiles, visits=args.visits)
+
+        print(f"{'build':<10}{'mode':<10}{'time to window':>16}{'time to report':>16}")
+        for build, command in builds:
+            for mode in args.mode or ['gui', 'headless']:
+                runs = []
+                try:
+                    for _ in range(args.repeat):
+                        runs.append(run_once(command, mode, work_dir, template, args.timeout))
+                except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+                    print(f"{build:<10}{mode:<10}failed: {e}")
+                    continue
+                row = {'build': build, 'mode': mode, 'runs': len(runs)}
+                for metric in ('window', 'first_report'):
+                    values = [run[metric] for run in runs if metric in run]
+                    row[f"{metric}_seconds"] = statistics.median(values) if values else None
+                results.append(row)
+                cells = [
+                    f"{row[key] * 1000:>14.0f}ms" if row[key] is not None else f"{'-':>16}"
+                    for key in ('window_seconds', 'first_report_seconds')
+                ]
+                print(f"{build:<10}{mode:<10}{''.join(cells)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'frozen_build': exe,
+                'profiles': args.profiles,
+                'visits': args.visits,
+                'results': results,
+            }, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -36,7 +36,11 @@ def main():
     os.system("pip install pyinstaller pywin32")
     
     # Build the executable
-    os.system("pyinstaller --onefile --windowed --icon=resources/icon.ico src/main.py")
+    # Modules imported through LazyModule are invisible to PyInstaller's import scan
+    hidden_imports = ['pandas', 'numpy', 'tkinter', 'tkinter.ttk', 'matplotlib.figure',
+                      'matplotlib.backends.backend_tkagg']
+    hidden = " ".join(f"--hidden-import={name}" for name in hidden_imports)
+    os.system(f"pyinstaller --onefile --windowed {hidden} --icon=resources/icon.ico src/main.py")
     
     # Create shortcut on desktop
     desktop_path = get_desktop_path()
@@ -9,6 +9,9 @@ setup(
         "matplotlib>=3.8.2",
         "python-dateutil>=2.8.2",
     ],
+    extras_require={
+        "parquet": ["pyarrow>=10.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "browser-time-analyzer=src.main:main",
@@ -16,5 +19,5 @@ setup(
     },
     author="Simon Sikkeland",
     description="A tool to analyze browser history and calculate time distribution across profiles",
-    python_requires=">=3.8",
+    python_requires=">=3.9",
 ) 
\ No newline at end of file
@@ -1,17 +1,452 @@
 import sqlite3
-import pandas as pd
 import os
 import json
+import time
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-from urllib.parse import urlparse
-import tkinter as tk
-from tkinter import ttk, messagebox
+from urllib.parse import urlparse, parse_qs
+import argparse
+import importlib
 import sys
+import copy
+import queue
+import threading
+from collections import OrderedDict
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    Keeps tkinter and matplotlib out of headless runs, which never touch
+    them, and pandas and numpy out of the GUI's startup, so the window
+    appears before they load. For optional dependencies, install_hint is
+    added to the ImportError raised when the module is missing.
+    """
+
+    def __init__(self, name, install_hint=None):
+        self._name = name
+        self._install_hint = install_hint
+        self._module = None
+
+    def _load(self):
+        """Import the module now if it is not loaded yet, and return it"""
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                if self._install_hint is None:
+                    raise
+                raise ImportError(f"{self._install_hint} ({e})") from e
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+tk = LazyModule('tkinter')
+ttk = LazyModule('tkinter.ttk')
+matplotlib_figure = LazyModule('matplotlib.figure')
+backend_tkagg = LazyModule('matplotlib.backends.backend_tkagg')
+PARQUET_HINT = "Parquet export needs pyarrow: pip install browser-time-analyzer[parquet]"
+pa = LazyModule('pyarrow', PARQUET_HINT)
+pq = LazyModule('pyarrow.parquet', PARQUET_HINT)
+
+# Microseconds between the Chrome epoch (1601-01-01) and the Unix epoch
+CHROME_EPOCH_OFFSET = 11644473600 * 1000000
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.browser_time_analyzer', 'visit_cache.db')
+
+class NullStage:
+    """Stage record used while timing is off; accepts and ignores everything"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+NULL_STAGE = NullStage()
+
+class StageRecord:
+    """Times one pipeline stage; rows and bytes_read may be set inside the block"""
+
+    def __init__(self, timer, name, profile):
+        self.timer = timer
+        self.name = name
+        self.profile = profile
+        self.rows = None
+        self.bytes_read = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add({
+            'stage': self.name,
+            'profile': self.profile,
+            'seconds': time.perf_counter() - self.started,
+            'rows': self.rows,
+            'bytes_read': self.bytes_read,
+        })
+        return False
+
+class StageTimer:
+    """Collects duration, row counts and bytes read per pipeline stage and profile.
+
+    While disabled, stage() hands out a shared no-op record, so instrumented
+    code pays only for the call itself.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = []
+        self._lock = threading.Lock()
+
+    def stage(self, name, profile=None):
+        if not self.enabled:
+            return NULL_STAGE
+        return StageRecord(self, name, profile)
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def summary(self):
+        """Totals per stage, in the order stages were first seen"""
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            total = totals.setdefault(record['stage'], {
+                'stage': record['stage'], 'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes_read': 0
+            })
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['rows'] += record['rows'] or 0
+            total['bytes_read'] += record['bytes_read'] or 0
+        return list(totals.values())
+
+    def to_dict(self):
+        with self._lock:
+            records = list(self.records)
+        return {'stages': self.summary(), 'records': records}
+
+    def format_summary(self):
+        lines = [f"{'Stage':<20}{'Calls':>6}{'Seconds':>10}{'Rows':>12}{'MB read':>10}"]
+        for total in self.summary():
+            lines.append(
+                f"{total['stage']:<20}{total['calls']:>6}{total['seconds']:>10.3f}"
+                f"{total['rows']:>12}{total['bytes_read'] / (1024 * 1024):>10.1f}"
+            )
+        return "\n".join(lines)
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used entries past maxsize"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class DomainDictionary:
+    """Maps domains to small integer codes, shared by every profile.
+
+    The compact storage layout keeps only these codes per visit.
+    """
+
+    def __init__(self):
+        self.domains = []
+        self.codes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.domains)
+
+    def encode(self, domains):
+        """Encode a categorical Series of domains; missing domains become -1"""
+        categories = domains.cat.categories
+        with self._lock:
+            mapping = np.empty(len(categories) + 1, dtype='int32')
+            for i, domain in enumerate(categories):
+                code = self.codes.get(domain)
+                if code is None:
+                    code = self.codes[domain] = len(self.domains)
+                    self.domains.append(domain)
+                mapping[i] = code
+        mapping[-1] = -1
+        # Categorical codes are -1 for missing values, which picks the last slot
+        return pd.Series(mapping[domains.cat.codes.to_numpy()], index=domains.index)
+
+    def decode(self, codes):
+        """Return the domain strings for an array of codes"""
+        with self._lock:
+            domains = np.array(self.domains, dtype=object)
+        return domains[np.asarray(codes)]
+
+class BillingRules:
+    """Assigns domains and URL path prefixes to billing buckets.
+
+    Patterns are host names, optionally followed by a path prefix:
+
+        example.com          example.com and all of its subdomains
+        =example.com         example.com only
+        *.example.com        subdomains of example.com only
+        api.*.example.com    a * label matches exactly one label
+        example.com/alpha    URLs under /alpha on example.com or its subdomains
+
+    Rules are compiled into a trie keyed by reversed host labels, so a
+    domain is resolved by walking its labels once instead of testing every
+    rule. The most specific match wins: more literal labels first, then
+    longer patterns, then longer path prefixes, then earlier rules.
+    """
+
+    def __init__(self, buckets=None, default_bucket='Unassigned'):
+        self.default_bucket = default_bucket
+        self.root = {'children': {}, 'rules': []}
+        self.rule_count = 0
+        self.resolved = {}
+        for bucket, patterns in (buckets or {}).items():
+            for pattern in patterns:
+                self.add(pattern, bucket)
+
+    @classmethod
+    def load(cls, path):
+        """Load rules from a JSON file: {"default": ..., "buckets": {bucket: [pattern, ...]}}"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('buckets', {}), data.get('default', 'Unassigned'))
+
+    def add(self, pattern, bucket):
+        host, _, path = pattern.strip().partition('/')
+        host = host.lower()
+        path = '/' + path.rstrip('/') if path else ''
+        if host.startswith('='):
+            mode, host = 'exact', host[1:]
+        elif host.startswith('*.'):
+            mode, host = 'below', host[2:]
+        else:
+            mode = 'suffix'
+        labels = host.strip('.').split('.')
+        if not all(labels):
+            raise ValueError(f"Invalid billing rule pattern: {pattern}")
+
+        node = self.root
+        for label in reversed(labels):
+            node = node['children'].setdefault(label, {'children': {}, 'rules': []})
+        literal = sum(label != '*' for label in labels)
+        node['rules'].append((mode, path, bucket, literal, len(labels), self.rule_count))
+        self.rule_count += 1
+        self.resolved.clear()
+
+    def resolve(self, domain):
+        """Return the (path_prefix, bucket) candidates for a domain, best first.
+
+        The last candidate always has an empty path prefix and is the
+        bucket for URLs no path rule matches. Results are memoized.
+        """
+        candidates = self.resolved.get(domain)
+        if candidates is not None:
+            return candidates
+
+        host = domain.lower().rpartition('@')[2].split(':')[0].strip('.')
+        labels = host.split('.')[::-1] if host else []
+        matches = []
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            for mode, path, bucket, literal, length, order in node['rules']:
+                if (mode == 'suffix' or (mode == 'exact' and depth == len(labels))
+                        or (mode == 'below' and depth < len(labels))):
+                    matches.append(((literal, length, len(path), -order), path, bucket))
+            if depth < len(labels):
+                for key in (labels[depth], '*'):
+                    child = node['children'].get(key)
+                    if child is not None:
+                        stack.append((child, depth + 1))
+
+        candidates = []
+        for _, path, bucket in sorted(matches, key=lambda m: m[0], reverse=True):
+            candidates.append((path, bucket))
+            if not path:
+                break
+        if not candidates or candidates[-1][0]:
+            candidates.append(('', self.default_bucket))
+        candidates = self.resolved[domain] = tuple(candidates)
+        return candidates
+
+    def match(self, domain, path=''):
+        """Return the bucket for a domain and URL path"""
+        for prefix, bucket in self.resolve(domain):
+            if not prefix or path == prefix or path.startswith(prefix + '/'):
+                return bucket
+
+class VisitCache:
+    """Persistent store of visits already ingested from browser History files.
+
+    Visits are keyed by browser and profile. A watermark records the highest
+    visits.id and visit_time seen per profile, so later runs only need to read
+    rows newer than that from the browser database.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self.connect()
+        try:
+            # In WAL mode a worker streaming from the cache does not block
+            # other workers' appends
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS visits (
+                browser TEXT NOT NULL,
+                profile INTEGER NOT NULL,
+                visit_id INTEGER NOT NULL,
+                url TEXT,
+                title TEXT,
+                visit_time INTEGER NOT NULL,
+                visit_duration INTEGER,
+                PRIMARY KEY (browser, profile, visit_id)
+            );
+            CREATE INDEX IF NOT EXISTS visits_time_index
+                ON visits (browser, profile, visit_time);
+            CREATE TABLE IF NOT EXISTS watermarks (
+                browser TEXT NOT NULL,
+                profile INTEGER NOT NULL,
+                source TEXT,
+                max_visit_id INTEGER NOT NULL,
+                max_visit_time INTEGER NOT NULL,
+                PRIMARY KEY (browser, profile)
+            );
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get_watermark(self, browser, profile):
+        """Return (source, max_visit_id, max_visit_time) or None if nothing is cached"""
+        conn = self.connect()
+        try:
+            return conn.execute(
+                "SELECT source, max_visit_id, max_visit_time FROM watermarks WHERE browser = ? AND profile = ?",
+                (browser, profile)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def get_id_range(self, browser, profile, max_visit_id):
+        """Return (lowest visit_id, row count) of the cached visits up to max_visit_id"""
+        conn = self.connect()
+        try:
+            return conn.execute(
+                "SELECT MIN(visit_id), COUNT(*) FROM visits WHERE browser = ? AND profile = ? AND visit_id <= ?",
+                (browser, profile, max_visit_id)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def reset(self, browser, profile):
+        """Forget everything cached for a profile"""
+        conn = self.connect()
+        try:
+            conn.execute("DELETE FROM visits WHERE browser = ? AND profile = ?", (browser, profile))
+            conn.execute("DELETE FROM watermarks WHERE browser = ? AND profile = ?", (browser, profile))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def append(self, browser, profile, source, df):
+        """Store new or updated visits and advance the watermark"""
+        if df.empty:
+            return
+        rows = zip(
+            [browser] * len(df), [profile] * len(df),
+            df['visit_id'].tolist(), df['url'].tolist(), df['title'].tolist(),
+            df['visit_time'].tolist(), df['visit_duration'].tolist()
+        )
+        newest = df.loc[df['visit_id'].idxmax()]
+        conn = self.connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO visits VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute(
+                """
+                INSERT INTO watermarks VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (browser, profile) DO UPDATE SET
+                    source = excluded.source,
+                    max_visit_id = MAX(max_visit_id, excluded.max_visit_id),
+                    max_visit_time = CASE WHEN excluded.max_visit_id >= max_visit_id
+                        THEN excluded.max_visit_time ELSE max_visit_time END
+                """,
+                (browser, profile, source, int(newest['visit_id']), int(newest['visit_time']))
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load(self, browser, profile, since=None):
+        """Load the cached visits of a profile in visit_id order.
+
+        since, a (visit_id, visit_time) pair, limits the result to visits
+        with a higher visit_id or a visit_time at or after it.
+        """
+        query = """
+        SELECT visit_id, url, title, visit_time, visit_duration
+        FROM visits
+        WHERE browser = ? AND profile = ?
+        """
+        params = (browser, profile)
+        if since is not None:
+            query += "AND (visit_id > ? OR visit_time >= ?)"
+            params += tuple(since)
+        conn = self.connect()
+        try:
+            return pd.read_sql_query(query + " ORDER BY visit_id", conn, params=params)
+        finally:
+            conn.close()
+
+class AnalysisCancelled(Exception):
+    """Raised inside ingestion once its cancel_event is set"""
+
 class BrowserHistoryAnalyzer:
     BROWSER_PATHS = {
         'Vivaldi': {
@@ -32,34 +467,133 @@ class BrowserHistoryAnalyzer:
         }
     }
 
-    def __init__(self):
+    # Visits this recent are re-read on every run, since the browser only
+    # writes visit_duration once the user navigates away from a page
+    CACHE_REFRESH_WINDOW = 24 * 3600 * 1000000
+
+    # Totals kept per (week, period, profile, domain) bucket of the rollup
+    ROLLUP_MEASURES = ['visits', 'visit_duration', 'active_duration']
+
+    # Cap on the URL -> domain memo, which is cleared once it grows past this
+    DOMAIN_MEMO_LIMIT = 1000000
+
+    # Files SQLite keeps next to a database while it has uncommitted changes
+    SIDECAR_SUFFIXES = ('-wal', '-journal')
+
+    # The unnumbered "Default" profile directory is stored as profile 0
+    DEFAULT_PROFILE = 0
+
+    # Memoized reports kept per analyzer before the least recently used go
+    REPORT_CACHE_SIZE = 256
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, use_cache=True, max_workers=4):
         self.base_path = None
         self.browser_type = None
-        self.profiles = range(1, 9)  # Profiles 1 through 8
+        self.profiles = []
         self.history_data = {}
+        self.browser_history = {}
+        self.max_workers = max_workers
         self.profile_names = {}
         self.excluded_profiles = []
+        self.visit_cache = VisitCache(cache_path) if use_cache else None
+        self.db_access_mode = 'auto'  # 'auto', 'direct' or 'copy'
+        self.report_source = 'memory'  # 'memory' or 'sql'
+        self.domain_memo = {}
+        self.report_cache = LRUCache(self.REPORT_CACHE_SIZE)
+        self.data_version = 0
+        self.rollup_granularity = 'day'  # 'week', 'day' or 'hour'
+        self.rollup_cache = {}
+        self.profile_rollup_cache = {}
+        self.timings = StageTimer()
+        self.ingest_mode = 'full'  # 'full' or 'streaming'
+        self.chunk_size = 50000
+        self.memory_limit_mb = 256
+        self.browser_rollups = {}
+        self.profile_rollups = {}
+        self.storage_layout = 'full'  # 'full' or 'compact'
+        self.skip_unchanged = True
+        self.time_model = 'duration'  # 'duration' or 'interval'
+        self.idle_cap_minutes = 30
+        self.file_stats = {}
+        self.domain_dictionary = DomainDictionary()
+        self.fleet_rollup = None
+        self.fleet_profile_names = {}
+        self.billing_rules = None
+        self.local_state_cache = {}
+
+    def set_browser(self, browser_type, base_path=None):
+        """Set the browser type and find its path.
 
-    def set_browser(self, browser_type):
-        """Set the browser type and find its path"""
+        base_path overrides the browser's usual User Data folder.
+        """
         self.browser_type = browser_type
-        user_path = os.path.expanduser('~')
-        self.base_path = os.path.join(user_path, self.BROWSER_PATHS[browser_type]['path'])
+        if base_path is None:
+            user_path = os.path.expanduser('~')
+            base_path = os.path.join(user_path, self.BROWSER_PATHS[browser_type]['path'])
+        self.base_path = base_path
         self.profile_names = self.load_profile_names()
+        self.profiles = self.discover_profiles()
+        self.history_data = self.browser_history.setdefault(browser_type, {})
+        self.profile_rollups = self.browser_rollups.setdefault(browser_type, {})
+
+    def discover_profiles(self):
+        """List the profiles of the current browser that have a History file.
+
+        Profiles come from the Local State info_cache, falling back to the
+        profile directories themselves when Local State is missing.
+        """
+        candidates = set(self.profile_names)
+        try:
+            for entry in os.listdir(self.base_path):
+                profile_num = self.parse_profile_dir(entry)
+                if profile_num is not None:
+                    candidates.add(profile_num)
+        except OSError:
+            pass
+        return sorted(p for p in candidates if os.path.exists(self.get_profile_path(p)))
+
+    def parse_profile_dir(self, name):
+        """Return the profile number for a profile directory name, or None"""
+        if name == 'Default':
+            return self.DEFAULT_PROFILE
+        if name.startswith('Profile '):
+            try:
+                return int(name.split()[-1])
+            except ValueError:
+                return None
+        return None
+
+    def get_profile_dir(self, profile_num):
+        if profile_num == self.DEFAULT_PROFILE:
+            return 'Default'
+        return f"Profile {profile_num}"
+
+    def get_profile_name(self, profile_num):
+        return self.profile_names.get(profile_num, self.get_profile_dir(profile_num))
 
     def load_profile_names(self):
-        """Load profile names from Local State file"""
+        """Load profile names from Local State file.
+
+        Parsed names are kept in local_state_cache until the file's mtime or
+        size changes, since Local State can be large and set_browser runs
+        on every browser switch.
+        """
         try:
             local_state_path = os.path.join(self.base_path, self.BROWSER_PATHS[self.browser_type]['profile_file'])
+            st = os.stat(local_state_path)
+            cached = self.local_state_cache.get(local_state_path)
+            if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+                return dict(cached[1])
             with open(local_state_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 profile_names = {}
                 if 'profile' in data and 'info_cache' in data['profile']:
                     for profile_id, info in data['profile']['info_cache'].items():
-                        if profile_id.startswith('Profile'):
-                            profile_num = int(profile_id.split()[-1])
-                            profile_names[profile_num] = info.get('name', f'Profile {profile_num}')
-                return profile_names
+                        profile_num = self.parse_profile_dir(profile_id)
+                        if profile_num is not None:
+                            profile_names[profile_num] = info.get('name', profile_id)
+                self.local_state_cache[local_state_path] = ((st.st_mtime_ns, st.st_size), profile_names)
+                return dict(profile_names)
         except Exception as e:
             print(f"Error loading profile names: {str(e)}")
             return {}
@@ -69,20 +603,85 @@ class BrowserHistoryAnalyzer:
         self.excluded_profiles = profile_numbers
 
     def get_profile_path(self, profile_num):
-        return os.path.join(self.base_path, f"Profile {profile_num}", "History")
+        return os.path.join(self.base_path, self.get_profile_dir(profile_num), "History")
+
+    def has_pending_changes(self, db_path):
+        """Check for a non-empty -wal or -journal file next to the database"""
+        for suffix in self.SIDECAR_SUFFIXES:
+            try:
+                if os.path.getsize(db_path + suffix) > 0:
+                    return True
+            except OSError:
+                pass
+        return False
 
     def connect_to_db(self, db_path):
-        # Create a copy of the database file since it might be locked by the browser
-        temp_db = f"temp_history_{datetime.now().strftime('%Y%m%d%H%M%S')}.db"
-        with open(db_path, 'rb') as src, open(temp_db, 'wb') as dst:
-            dst.write(src.read())
-        
-        conn = sqlite3.connect(temp_db)
-        return conn, temp_db
+        """Open a History database read-only, copying it only when necessary.
+
+        Returns (conn, temp_path). temp_path is None when the database was
+        opened in place, otherwise it must be passed to cleanup_temp_db.
+        """
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"No history database at {db_path}")
+
+        # Uncommitted changes live in the sidecar files, which only get applied
+        # when SQLite opens the database together with them in a writable place
+        if self.db_access_mode == 'direct' or (
+                self.db_access_mode == 'auto' and not self.has_pending_changes(db_path)):
+            uri = Path(db_path).resolve().as_uri()
+            # immutable=1 skips file locking, which lets us read a database
+            # the browser holds an exclusive lock on. A running browser holds
+            # that lock for good, so the plain probe must fail fast instead of
+            # waiting out the busy timeout
+            for params in ('mode=ro', 'mode=ro&immutable=1'):
+                conn = None
+                try:
+                    conn = sqlite3.connect(f"{uri}?{params}", uri=True, timeout=0, check_same_thread=False)
+                    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                    conn.execute("PRAGMA busy_timeout = 5000")
+                    return conn, None
+                except sqlite3.Error:
+                    if conn is not None:
+                        conn.close()
+
+        return self.connect_to_copy(db_path)
+
+    def connect_to_copy(self, db_path):
+        """Stream the database and its sidecar files into a private temp directory"""
+        temp_dir = tempfile.mkdtemp(prefix='browser_history_')
+        try:
+            temp_db = os.path.join(temp_dir, 'History')
+            for suffix in ('',) + self.SIDECAR_SUFFIXES:
+                if suffix and not os.path.exists(db_path + suffix):
+                    continue
+                with open(db_path + suffix, 'rb') as src, open(temp_db + suffix, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            conn = sqlite3.connect(temp_db, check_same_thread=False)
+            return conn, temp_dir
+        except Exception:
+            self.cleanup_temp_db(temp_dir)
+            raise
+
+    def get_db_bytes(self, db_path, temp_db):
+        """Size of the files behind a connection: those connect_to_copy wrote, or those opened in place"""
+        if temp_db is not None:
+            return sum(entry.stat().st_size for entry in os.scandir(temp_db) if entry.is_file())
+        total = 0
+        for suffix in ('',) + self.SIDECAR_SUFFIXES:
+            try:
+                total += os.path.getsize(db_path + suffix)
+            except OSError:
+                pass
+        return total
 
     def cleanup_temp_db(self, temp_db):
+        if temp_db is None:
+            return
         try:
-            os.remove(temp_db)
+            if os.path.isdir(temp_db):
+                shutil.rmtree(temp_db)
+            else:
+                os.remove(temp_db)
         except:
             pass
 
@@ -97,97 +696,1277 @@ class BrowserHistoryAnalyzer:
         except (ValueError, OSError):
             return None
 
-    def analyze_profile(self, profile_num):
+    def check_cancelled(self, cancel_event):
+        if cancel_event is not None and cancel_event.is_set():
+            raise AnalysisCancelled()
+
+    def get_cache_watermark(self, profile_num, conn, profile_path):
+        """The profile's cache watermark, after resetting a cache that no longer matches its History"""
+        watermark = self.visit_cache.get_watermark(self.browser_type, profile_num)
+        if watermark is not None:
+            source, max_visit_id, max_visit_time = watermark
+            row = conn.execute("SELECT visit_time FROM visits WHERE id = ?", (max_visit_id,)).fetchone()
+            id_range = conn.execute("SELECT MIN(id), COUNT(*) FROM visits WHERE id <= ?", (max_visit_id,)).fetchone()
+            # A missing or rewritten watermark row means the history was cleared,
+            # and fewer rows up to it mean old visits expired or were deleted,
+            # so the cached visits can no longer be trusted
+            if (source != profile_path or row is None or row[0] != max_visit_time
+                    or tuple(id_range) != tuple(self.visit_cache.get_id_range(self.browser_type, profile_num, max_visit_id))):
+                self.visit_cache.reset(self.browser_type, profile_num)
+                watermark = None
+        return watermark
+
+    def sync_visit_cache(self, profile_num, conn, profile_path, load=True, cancel_event=None):
+        """Copy visits newer than the cached watermark into the visit cache.
+
+        Returns all cached visits of the profile, or None when load is False.
+        With load='new', only the visits this sync added or refreshed are
+        returned, which is everything after a reset.
+        """
+        watermark = self.get_cache_watermark(profile_num, conn, profile_path)
+        if watermark is not None:
+            _, max_visit_id, _ = watermark
+
+        query = """
+        SELECT
+            visits.id AS visit_id,
+            urls.url,
+            urls.title,
+            visits.visit_time,
+            visits.visit_duration
+        FROM urls
+        JOIN visits ON urls.id = visits.url
+        """
+        if watermark is None:
+            params = ()
+        else:
+            refresh_from = self.datetime_to_chrome_time(datetime.now()) - self.CACHE_REFRESH_WINDOW
+            query += "WHERE visits.id > ? OR visits.visit_time >= ?"
+            params = (max_visit_id, refresh_from)
+        # In id order the watermark never passes rows that were not written
+        # yet, so a sync that is cancelled part way resumes where it stopped
+        query += " ORDER BY visits.id"
+
+        # New rows are written chunk by chunk so a first sync of a large
+        # history never holds all of it in memory at once
+        for new_rows in self.iter_query_chunks(conn, query, params, profile_num, cancel_event):
+            with self.timings.stage('cache_write', profile_num) as stage:
+                self.visit_cache.append(self.browser_type, profile_num, profile_path, new_rows)
+                stage.rows = len(new_rows)
+
+        if not load:
+            return None
+        since = (max_visit_id, refresh_from) if load == 'new' and watermark is not None else None
+        with self.timings.stage('cache_load', profile_num) as stage:
+            df = self.visit_cache.load(self.browser_type, profile_num, since)
+            stage.rows = len(df)
+        return df
+
+    def get_previous_visits(self, profile_num, conn, profile_path):
+        """The profile's last cached frame, if new visits can be merged into it.
+
+        That is the case while it has the current layout and the cache has
+        not moved past the watermark the frame was built from.
+        """
+        previous = self.history_data.get(profile_num)
+        if previous is None or 'visit_id' not in previous.columns:
+            return None
+        if self.is_compact(previous) != (self.storage_layout == 'compact'):
+            return None
+        watermark = previous.attrs.get('cache_watermark')
+        if watermark is None or watermark != self.get_cache_watermark(profile_num, conn, profile_path):
+            return None
+        return previous
+
+    def merge_visits(self, previous, new_rows):
+        """Replace the visits of previous that new_rows holds again and add the rest, in visit_id order"""
+        if new_rows.empty:
+            # previous may still be shared with reports, so its attrs must not change
+            return previous.copy(deep=False)
+        kept = previous[~previous['visit_id'].isin(new_rows['visit_id'])]
+        if self.is_compact(previous):
+            merged = pd.concat([kept, new_rows], ignore_index=True)
+        else:
+            # Concatenating categoricals with different categories would fall
+            # back to strings, so the domain codes are combined separately
+            domains = pd.api.types.union_categoricals([kept['domain'], new_rows['domain']], ignore_order=True)
+            merged = pd.concat([kept.drop(columns='domain'), new_rows.drop(columns='domain')], ignore_index=True)
+            merged['domain'] = domains
+        return merged.sort_values('visit_id', kind='stable', ignore_index=True)
+
+    def iter_query_chunks(self, conn, query, params=(), profile_num=None, cancel_event=None):
+        """Run a query and yield its result as DataFrames of bounded size.
+
+        The first chunk has chunk_size rows. Later chunk sizes are derived
+        from its measured size per row, so that a chunk and the temporaries
+        made while converting it take about a quarter of memory_limit_mb.
+        Raises AnalysisCancelled between chunks once cancel_event is set.
+        """
+        cursor = None
+        try:
+            rows_per_chunk = self.chunk_size
+            first = True
+            while True:
+                self.check_cancelled(cancel_event)
+                # Running the query is timed together with the first chunk
+                with self.timings.stage('query', profile_num) as stage:
+                    if cursor is None:
+                        cursor = conn.execute(query, params)
+                        columns = [column[0] for column in cursor.description]
+                    batch = cursor.fetchmany(rows_per_chunk)
+                    stage.rows = len(batch)
+                if not batch:
+                    break
+                chunk = pd.DataFrame.from_records(batch, columns=columns)
+                del batch
+                if first and self.memory_limit_mb:
+                    bytes_per_row = max(1, chunk.memory_usage(deep=True).sum() / len(chunk))
+                    budget = self.memory_limit_mb * 1024 * 1024 / 4
+                    rows_per_chunk = int(min(max(budget / (bytes_per_row * 4), 1000), 1000000))
+                    first = False
+                yield chunk
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def valid_chrome_times(self, values):
+        """Mask of Chrome timestamps that convert_chrome_times can represent"""
+        max_value = pd.Timestamp.max.value // 1000 - 2 * 86400 * 1000000
+        return (values > CHROME_EPOCH_OFFSET) & (values - CHROME_EPOCH_OFFSET < max_value)
+
+    def convert_chrome_times(self, timestamps):
+        """Vectorized convert_chrome_time for a Series of Chrome timestamps.
+
+        Returns naive local datetimes, with NaT for zero or out-of-range values.
+        """
+        values = pd.to_numeric(timestamps, errors='coerce').fillna(0).astype('int64').to_numpy()
+        valid = self.valid_chrome_times(values)
+        unix_us = np.where(valid, values - CHROME_EPOCH_OFFSET, 0)
+
+        # UTC offsets only change on quarter-hour boundaries, so look them up
+        # once per distinct 15 minute bucket instead of once per visit
+        buckets = unix_us // (900 * 1000000)
+        codes, uniques = pd.factorize(buckets)
+        offsets = np.array([time.localtime(int(b) * 900).tm_gmtoff for b in uniques], dtype='int64')
+        local_us = unix_us + offsets[codes] * 1000000
+
+        times = pd.Series(pd.to_datetime(local_us, unit='us'), index=timestamps.index)
+        return times.where(valid)
+
+    def extract_domains(self, urls):
+        """Extract domains as a categorical, parsing each distinct URL only once.
+
+        Parsed URLs are remembered in domain_memo, so the same URL seen in
+        another profile or a later analysis is not parsed again.
+        """
+        url_codes, unique_urls = pd.factorize(urls)
+        if len(self.domain_memo) > self.DOMAIN_MEMO_LIMIT:
+            self.domain_memo.clear()
+        memo = self.domain_memo
+        domains = []
+        for url in unique_urls:
+            domain = memo.get(url)
+            if domain is None:
+                domain = memo[url] = urlparse(url).netloc
+            domains.append(domain)
+
+        domain_codes, unique_domains = pd.factorize(pd.Index(domains, dtype=object))
+        codes = np.full(len(url_codes), -1, dtype='int64')
+        known = url_codes >= 0
+        codes[known] = domain_codes[url_codes[known]]
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories=unique_domains),
+            index=urls.index
+        )
+
+    def analyze_profile(self, profile_num, cancel_event=None):
+        """Load a profile's visits; returns None if it failed or was cancelled"""
         profile_path = self.get_profile_path(profile_num)
         
         try:
-            conn, temp_db = self.connect_to_db(profile_path)
-            
-            # Query to get visit history with timestamps
-            query = """
-            SELECT
-                urls.url,
-                urls.title,
-                visits.visit_time,
-                visits.visit_duration
-            FROM urls
-            JOIN visits ON urls.id = visits.url
-            ORDER BY visits.visit_time DESC
-            """
+            self.check_cancelled(cancel_event)
+            with self.timings.stage('connect_to_db', profile_num) as stage:
+                conn, temp_db = self.connect_to_db(profile_path)
+                if stage:
+                    stage.bytes_read = self.get_db_bytes(profile_path, temp_db)
             
-            df = pd.read_sql_query(query, conn)
+            previous = None
+            try:
+                if self.visit_cache is not None:
+                    # A frame from the last run only needs the visits that were
+                    # added or refreshed since, instead of reconverting them all
+                    previous = self.get_previous_visits(profile_num, conn, profile_path)
+                    load = True if previous is None else 'new'
+                    df = self.sync_visit_cache(profile_num, conn, profile_path, load, cancel_event)
+                    watermark = self.visit_cache.get_watermark(self.browser_type, profile_num)
+                else:
+                    # Query to get visit history with timestamps
+                    query = """
+                    SELECT
+                        urls.url,
+                        urls.title,
+                        visits.visit_time,
+                        visits.visit_duration
+                    FROM urls
+                    JOIN visits ON urls.id = visits.url
+                    """
+                    
+                    # Read in chunks so Cancel does not wait for the whole history
+                    chunks = list(self.iter_query_chunks(conn, query, (), profile_num, cancel_event))
+                    if chunks:
+                        df = pd.concat(chunks, ignore_index=True)
+                    else:
+                        df = pd.DataFrame(columns=['url', 'title', 'visit_time', 'visit_duration'])
+                    del chunks
+            finally:
+                conn.close()
+                self.cleanup_temp_db(temp_db)
             
-            # Convert timestamps using our custom function
-            df['visit_time'] = df['visit_time'].apply(self.convert_chrome_time)
-            
-            # Drop rows with invalid timestamps
-            df = df.dropna(subset=['visit_time'])
-            
-            # Extract domain from URL
-            df['domain'] = df['url'].apply(lambda x: urlparse(x).netloc)
-            
-            conn.close()
-            self.cleanup_temp_db(temp_db)
+            self.check_cancelled(cancel_event)
+            if self.storage_layout == 'compact':
+                df = self.compact_visits(df, profile_num)
+            else:
+                with self.timings.stage('convert_times', profile_num) as stage:
+                    df['visit_time'] = self.convert_chrome_times(df['visit_time'])
+                    stage.rows = len(df)
+                
+                # Drop rows with invalid timestamps
+                df = df.dropna(subset=['visit_time'])
+                
+                self.check_cancelled(cancel_event)
+                with self.timings.stage('extract_domains', profile_num) as stage:
+                    df['domain'] = self.extract_domains(df['url'])
+                    stage.rows = len(df)
             
+            if previous is not None:
+                with self.timings.stage('merge_visits', profile_num) as stage:
+                    df = self.merge_visits(previous, df)
+                    stage.rows = len(df)
+            if self.visit_cache is not None:
+                df.attrs['cache_watermark'] = watermark
             return df
             
+        except AnalysisCancelled:
+            return None
         except Exception as e:
             print(f"Error analyzing profile {profile_num}: {str(e)}")
             return None
 
-    def analyze_all_profiles(self):
-        for profile in self.profiles:
-            df = self.analyze_profile(profile)
-            if df is not None and not df.empty:
-                self.history_data[profile] = df
+    def compact_visits(self, df, profile_num=None):
+        """Reduce raw visits to the compact storage layout.
 
-    def get_week_data(self, df, week_offset=0):
-        """Filter dataframe for a specific week's data"""
+        Keeps int64 Chrome timestamps, int64 durations and int32 domain codes
+        from domain_dictionary. URLs and titles are dropped; path billing
+        rules read a week's URLs back with query_week_visits. visit_id is
+        kept for visits from the visit cache, so later runs can merge into them.
+        """
+        values = pd.to_numeric(df['visit_time'], errors='coerce').fillna(0).astype('int64')
+        df = df[self.valid_chrome_times(values.to_numpy())]
+        with self.timings.stage('extract_domains', profile_num) as stage:
+            domains = self.domain_dictionary.encode(self.extract_domains(df['url']))
+            stage.rows = len(df)
+        compact = pd.DataFrame({
+            'visit_time': values[df.index],
+            'visit_duration': pd.to_numeric(df['visit_duration']).fillna(0).astype('int64'),
+            'domain': domains.astype('int32'),
+        })
+        if 'visit_id' in df.columns:
+            compact.insert(0, 'visit_id', df['visit_id'].astype('int64'))
+        # Visits without a domain never show up in reports
+        return compact[compact['domain'] >= 0].reset_index(drop=True)
+
+    def is_compact(self, df):
+        return pd.api.types.is_integer_dtype(df['visit_time'])
+
+    def memory_report(self):
+        """Memory used by each ingested profile of the current browser"""
+        rows = []
+        for profile, df in self.history_data.items():
+            layout = 'compact' if self.is_compact(df) else 'full'
+            rows.append((profile, layout, len(df), int(df.memory_usage(deep=True).sum())))
+        for profile, rollup in self.profile_rollups.items():
+            rows.append((profile, 'rollup', int(rollup['visits'].sum()), int(rollup.memory_usage(deep=True).sum())))
+
+        report = pd.DataFrame(rows, columns=['profile', 'layout', 'visits', 'bytes'])
+        report.insert(1, 'profile_name', [self.get_profile_name(p) for p in report['profile']])
+        report['bytes_per_visit'] = (report['bytes'] / report['visits'].where(report['visits'] > 0)).round(1)
+        report['mb'] = (report['bytes'] / (1024 * 1024)).round(2)
+        return report
+
+    def stream_profile(self, profile_num, cancel_event=None):
+        """Ingest a profile chunk by chunk straight into its rollup.
+
+        Each chunk is converted, folded into running (week, period, domain)
+        totals and discarded, so visits and titles are never all in memory.
+        Integer sums make the result identical to rolling up a full load.
+        """
+        profile_path = self.get_profile_path(profile_num)
+        try:
+            self.check_cancelled(cancel_event)
+            with self.timings.stage('connect_to_db', profile_num) as stage:
+                conn, temp_db = self.connect_to_db(profile_path)
+                if stage:
+                    stage.bytes_read = self.get_db_bytes(profile_path, temp_db)
+
+            try:
+                if self.visit_cache is not None:
+                    self.sync_visit_cache(profile_num, conn, profile_path, load=False, cancel_event=cancel_event)
+                    source = self.visit_cache.connect()
+                    query = """
+                    SELECT url, visit_time, visit_duration
+                    FROM visits
+                    WHERE browser = ? AND profile = ?
+                    ORDER BY visit_time
+                    """
+                    params = (self.browser_type, profile_num)
+                else:
+                    source = conn
+                    query = """
+                    SELECT
+                        urls.url,
+                        visits.visit_time,
+                        visits.visit_duration
+                    FROM visits
+                    JOIN urls ON urls.id = visits.url
+                    ORDER BY visits.visit_time
+                    """
+                    params = ()
+
+                # Chunks arrive in visit_time order (served by the time index),
+                # so overlapping visits can be merged across chunk boundaries
+                carry = {}
+                try:
+                    partials = []
+                    partial_bytes = 0
+                    budget = (self.memory_limit_mb or 0) * 1024 * 1024 / 4
+                    merge_at = budget
+                    for chunk in self.iter_query_chunks(source, query, params, profile_num, cancel_event):
+                        with self.timings.stage('convert_times', profile_num) as stage:
+                            chunk['visit_time'] = self.convert_chrome_times(chunk['visit_time'])
+                            chunk = chunk.dropna(subset=['visit_time'])
+                            stage.rows = len(chunk)
+                        with self.timings.stage('extract_domains', profile_num) as stage:
+                            chunk['domain'] = self.extract_domains(chunk['url'])
+                            stage.rows = len(chunk)
+                        with self.timings.stage('rollup', profile_num) as stage:
+                            partial = self.build_profile_rollup(chunk, carry=carry)
+                            stage.rows = len(chunk)
+                        del chunk
+                        partials.append(partial)
+                        partial_bytes += partial.memory_usage(deep=True).sum() if budget else 0
+                        if budget and partial_bytes > merge_at:
+                            partials = [self.merge_rollups(partials)]
+                            partial_bytes = partials[0].memory_usage(deep=True).sum()
+                            # The merged totals cannot shrink below the number of
+                            # distinct buckets, so back off instead of re-merging
+                            # after every chunk
+                            merge_at = max(budget, 2 * partial_bytes)
+                finally:
+                    if source is not conn:
+                        source.close()
+            finally:
+                conn.close()
+                self.cleanup_temp_db(temp_db)
+
+            if not partials:
+                return None
+            rollup = self.merge_rollups(partials)
+            rollup.attrs['granularity'] = self.rollup_granularity
+            rollup.attrs['idle_cap_minutes'] = self.idle_cap_minutes
+            return rollup
+
+        except AnalysisCancelled:
+            return None
+        except Exception as e:
+            print(f"Error streaming profile {profile_num}: {str(e)}")
+            return None
+
+    def merge_rollups(self, rollups):
+        """Combine partial rollups that may share buckets"""
+        if len(rollups) == 1:
+            return rollups[0]
+        return pd.concat(rollups, ignore_index=True).groupby(
+            ['week', 'period', 'domain'], sort=False
+        ).agg({measure: 'sum' for measure in self.ROLLUP_MEASURES}).reset_index()
+
+    def ingest_profile(self, profile_num, cancel_event=None):
+        """Ingest a profile according to ingest_mode; returns (result, file_stat) for store_profile_result"""
+        # Stats are taken before reading, so a write that races with the
+        # read makes the profile look changed on the next check
+        file_stat = (
+            self.get_profile_path(profile_num),
+            (self.get_history_stats(profile_num), self.get_ingest_signature())
+        )
+        if self.ingest_mode == 'streaming':
+            result = self.stream_profile(profile_num, cancel_event)
+        else:
+            result = self.analyze_profile(profile_num, cancel_event)
+        return result, file_stat
+
+    def get_history_stats(self, profile_num):
+        """Size and mtime of a profile's History file and its -wal/-journal sidecars"""
+        path = self.get_profile_path(profile_num)
+        stats = []
+        for suffix in ('',) + self.SIDECAR_SUFFIXES:
+            try:
+                st = os.stat(path + suffix)
+                stats.append((st.st_size, st.st_mtime_ns))
+            except OSError:
+                stats.append(None)
+        return tuple(stats)
+
+    def get_ingest_signature(self):
+        """Settings that change what ingest_profile produces for the same files"""
+        if self.ingest_mode == 'streaming':
+            return (self.ingest_mode, self.rollup_granularity, self.idle_cap_minutes)
+        return (self.ingest_mode, self.storage_layout)
+
+    def changed_profiles(self, profiles=None):
+        """Profiles whose History files changed since they were last ingested"""
+        profiles = self.profiles if profiles is None else profiles
+        signature = self.get_ingest_signature()
+        return [
+            p for p in profiles
+            if self.file_stats.get(self.get_profile_path(p)) != (self.get_history_stats(p), signature)
+        ]
+
+    def store_profile_result(self, profile_num, result, browser_type=None, file_stat=None):
+        """Keep the result of ingest_profile for reports; returns False if it was empty.
+
+        None means ingestion failed, and any earlier result is kept.
+        file_stat, as returned by ingest_profile, marks the profile as
+        unchanged until its History files change again.
+        """
+        if result is None:
+            return False
+        if file_stat is not None:
+            path, stat = file_stat
+            self.file_stats[path] = stat
+        browser_type = browser_type or self.browser_type
+        history = self.browser_history.setdefault(browser_type, {})
+        rollups = self.browser_rollups.setdefault(browser_type, {})
+        if result.empty:
+            history.pop(profile_num, None)
+            rollups.pop(profile_num, None)
+            return False
+        if 'period' in result.columns:
+            rollups[profile_num] = result
+            history.pop(profile_num, None)
+        else:
+            history[profile_num] = result
+            rollups.pop(profile_num, None)
+        return True
+
+    def has_data(self):
+        return bool(self.history_data or self.profile_rollups)
+
+    def scan_profiles(self, tasks, max_workers=None, cancel_event=None):
+        """Run ingest_profile for (analyzer, profile) pairs on a thread pool, yielding (analyzer, profile, result, file_stat)"""
+        tasks = list(tasks)
+        if not tasks:
+            return
+        workers = max(1, min(max_workers or self.max_workers, len(tasks)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                pool.submit(analyzer.ingest_profile, profile, cancel_event): (analyzer, profile)
+                for analyzer, profile in tasks
+            }
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                analyzer, profile = futures[future]
+                yield (analyzer, profile) + future.result()
+                if cancel_event is not None and cancel_event.is_set():
+                    for queued in futures:
+                        queued.cancel()
+        finally:
+            # Closing the generator early must not leave queued profiles
+            # running, nor wait for the ones already started
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_profiles_to_scan(self):
+        """Profiles that need ingesting; unchanged ones are skipped when skip_unchanged is set"""
+        for store in (self.history_data, self.profile_rollups):
+            for profile in [p for p in store if p not in self.profiles]:
+                del store[profile]
+        if not self.skip_unchanged:
+            return list(self.profiles)
+        return self.changed_profiles()
+
+    def analyze_all_profiles(self, max_workers=None):
+        profiles = self.get_profiles_to_scan()
+        for _, profile, result, file_stat in self.scan_profiles(((self, p) for p in profiles), max_workers):
+            self.store_profile_result(profile, result, file_stat=file_stat)
+        if profiles:
+            self.invalidate_reports()
+
+    def enable_timing(self, enabled=True):
+        """Turn per-stage timing on or off; turning it on clears earlier records"""
+        if enabled and not self.timings.enabled:
+            self.timings.reset()
+        self.timings.enabled = enabled
+
+    def get_timing_profile(self):
+        """Return the recorded stage timings as a JSON-serializable dict"""
+        return self.timings.to_dict()
+
+    def get_timing_json(self, indent=2):
+        return json.dumps(self.get_timing_profile(), indent=indent)
+
+    def invalidate_reports(self):
+        """Drop memoized reports; call whenever ingested data changes"""
+        self.data_version += 1
+        self.report_cache.clear()
+
+    def for_browser(self, browser_type, base_path=None):
+        """Create an analyzer for another browser that shares this one's caches and settings.
+
+        base_path defaults to this analyzer's own when the browser is the same.
+        """
+        if base_path is None and browser_type == self.browser_type:
+            base_path = self.base_path
+        scanner = copy.copy(self)
+        # Reuse what this analyzer already holds for the browser, so unchanged
+        # profiles can be skipped
+        scanner.browser_history = {browser_type: self.browser_history.get(browser_type, {})}
+        scanner.browser_rollups = {browser_type: self.browser_rollups.get(browser_type, {})}
+        scanner.report_cache = LRUCache(self.REPORT_CACHE_SIZE)
+        scanner.rollup_cache = {}
+        scanner.profile_rollup_cache = dict(self.profile_rollup_cache)
+        scanner.set_browser(browser_type, base_path)
+        return scanner
+
+    def analyze_browsers(self, browser_types, max_workers=None):
+        """Scan several browsers concurrently into one combined DataFrame.
+
+        Every profile of every browser runs on the same pool. The result has
+        browser, profile and profile_name columns; per-browser data is also
+        kept in browser_history (or browser_rollups when streaming) for reports.
+        """
+        scanners = []
+        for browser_type in browser_types:
+            scanner = self.for_browser(browser_type)
+            if not scanner.profiles:
+                print(f"No profiles found for {browser_type}")
+                continue
+            scanners.append(scanner)
+
+        tasks = [(scanner, profile) for scanner in scanners for profile in scanner.get_profiles_to_scan()]
+        for scanner, profile, df, file_stat in self.scan_profiles(tasks, max_workers):
+            scanner.store_profile_result(profile, df, file_stat=file_stat)
+
+        frames = []
+        for scanner in scanners:
+            for store in (scanner.history_data, scanner.profile_rollups):
+                for profile, df in store.items():
+                    frames.append(df.assign(
+                        browser=scanner.browser_type,
+                        profile=profile,
+                        profile_name=scanner.get_profile_name(profile)
+                    ))
+
+        for scanner in scanners:
+            self.browser_history[scanner.browser_type] = scanner.history_data
+            self.browser_rollups[scanner.browser_type] = scanner.profile_rollups
+            if scanner.browser_type == self.browser_type:
+                self.history_data = scanner.history_data
+                self.profile_rollups = scanner.profile_rollups
+        self.invalidate_reports()
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def get_visit_weeks(self, df):
+        """Local start of the week each visit falls in, for either storage layout"""
+        times = self.convert_chrome_times(df['visit_time']) if self.is_compact(df) else df['visit_time']
+        days = times.dt.normalize()
+        return days - pd.to_timedelta(times.dt.weekday, unit='D')
+
+    def write_week_partitions(self, df, weeks, directory):
+        """Write df as one Parquet file per week under directory/week=YYYY-MM-DD.
+
+        A week column is left out of the files, since readers of the dataset
+        add one from the partition key.
+        """
+        for week, part in df.groupby(weeks, sort=True):
+            part = part.drop(columns='week', errors='ignore').reset_index(drop=True)
+            if isinstance(part['domain'].dtype, pd.CategoricalDtype):
+                part['domain'] = part['domain'].cat.remove_unused_categories()
+            week_dir = os.path.join(directory, f"week={week:%Y-%m-%d}")
+            os.makedirs(week_dir, exist_ok=True)
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            pq.write_table(self.widen_dictionaries(table), os.path.join(week_dir, 'part-0.parquet'))
+
+    def widen_dictionaries(self, table):
+        """Give every dictionary column int32 indices, so all week files share one schema"""
+        schema = pa.schema([
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type) else field
+            for field in table.schema
+        ], metadata=table.schema.metadata)
+        return table.cast(schema)
+
+    def export_parquet(self, root):
+        """Write all ingested visits and rollups to Parquet datasets under root, partitioned by browser, profile and week"""
+        # Raises the install hint before any files are touched when pyarrow is missing
+        pa.Table
+        manifest = {
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'rollup_granularity': self.rollup_granularity,
+            'idle_cap_minutes': self.idle_cap_minutes,
+            'browsers': {},
+        }
+        for browser_type in sorted(set(self.browser_history) | set(self.browser_rollups)):
+            history = self.browser_history.get(browser_type, {})
+            rollups = self.browser_rollups.get(browser_type, {})
+            if not history and not rollups:
+                continue
+            names = self.profile_names if browser_type == self.browser_type else {}
+            profiles = manifest['browsers'][browser_type] = {}
+            for kind in ('visits', 'rollups'):
+                shutil.rmtree(os.path.join(root, kind, f"browser={browser_type}"), ignore_errors=True)
+
+            for profile, df in sorted(history.items()):
+                with self.timings.stage('export_parquet', profile) as stage:
+                    profile_dir = f"browser={browser_type}/profile={profile}"
+                    layout = 'compact' if self.is_compact(df) else 'full'
+                    visits = df
+                    if layout == 'compact':
+                        visits = df.assign(
+                            visit_time=self.convert_chrome_times(df['visit_time']),
+                            domain=pd.Categorical(self.domain_dictionary.decode(df['domain']))
+                        )
+                    self.write_week_partitions(
+                        visits, self.get_visit_weeks(df), os.path.join(root, 'visits', profile_dir)
+                    )
+                    rollup = self.build_profile_rollup(df)
+                    self.write_week_partitions(rollup, rollup['week'], os.path.join(root, 'rollups', profile_dir))
+                    stage.rows = len(df)
+                profiles[str(profile)] = {
+                    'name': names.get(profile, self.get_profile_dir(profile)),
+                    'layout': layout,
+                }
+
+            for profile, rollup in sorted(rollups.items()):
+                with self.timings.stage('export_parquet', profile) as stage:
+                    profile_dir = f"browser={browser_type}/profile={profile}"
+                    self.write_week_partitions(rollup, rollup['week'], os.path.join(root, 'rollups', profile_dir))
+                    stage.rows = len(rollup)
+                profiles[str(profile)] = {
+                    'name': names.get(profile, self.get_profile_dir(profile)),
+                    'layout': 'rollup',
+                    'granularity': rollup.attrs.get('granularity', self.rollup_granularity),
+                    'idle_cap_minutes': rollup.attrs.get('idle_cap_minutes', self.idle_cap_minutes),
+                }
+
+        os.makedirs(root, exist_ok=True)
+        with open(os.path.join(root, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def read_partitions(self, directory, with_week=False):
+        """Read and concatenate the week files of one profile into a regular DataFrame.
+
+        memory_map only spares a copy while reading the files; columns are
+        decompressed and converted by to_pandas, so the result is an
+        ordinary in-memory frame rather than a view of the files. with_week
+        adds the week column back from the partition keys.
+        """
+        weeks = sorted(week for week in os.listdir(directory) if week.startswith('week='))
+        tables = [
+            pq.read_table(os.path.join(directory, week, 'part-0.parquet'), memory_map=True)
+            for week in weeks
+        ]
+        if len(tables) > 1:
+            # Older exports stored weeks with few domains with narrower
+            # dictionary indices, which concat_tables rejects
+            table = pa.concat_tables([self.widen_dictionaries(t) for t in tables])
+        else:
+            table = tables[0]
+        df = table.unify_dictionaries().to_pandas()
+        if with_week:
+            starts = pd.to_datetime([week[len('week='):] for week in weeks])
+            df.insert(0, 'week', np.repeat(starts.to_numpy(), [t.num_rows for t in tables]))
+        return df
+
+    def load_parquet(self, root, browser_type=None):
+        """Load data written by export_parquet instead of reading the browser databases.
+
+        Visit tables go to history_data and streamed rollups to
+        profile_rollups, so all reports work as after analyze_all_profiles.
+        browser_type defaults to the current browser, or the first one in the
+        export. Returns the loaded profile numbers. Needs pyarrow.
+        """
+        with open(os.path.join(root, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        browser_type = browser_type or self.browser_type or next(iter(manifest['browsers']), None)
+        entries = manifest['browsers'].get(browser_type)
+        if not entries:
+            raise ValueError(f"No {browser_type} data in {root}")
+
+        history = {}
+        rollups = {}
+        for profile, entry in entries.items():
+            profile = int(profile)
+            profile_dir = f"browser={browser_type}/profile={profile}"
+            with self.timings.stage('load_parquet', profile) as stage:
+                if entry['layout'] == 'rollup':
+                    rollup = self.read_partitions(os.path.join(root, 'rollups', profile_dir), with_week=True)
+                    rollup['domain'] = rollup['domain'].astype(object)
+                    rollup.attrs['granularity'] = entry['granularity']
+                    rollup.attrs['idle_cap_minutes'] = entry['idle_cap_minutes']
+                    rollups[profile] = rollup
+                    stage.rows = len(rollup)
+                    continue
+                df = history[profile] = self.read_partitions(os.path.join(root, 'visits', profile_dir))
+                stage.rows = len(df)
+
+        self.browser_type = browser_type
+        self.browser_history[browser_type] = self.history_data = history
+        self.browser_rollups[browser_type] = self.profile_rollups = rollups
+        self.profile_names = {int(p): entry['name'] for p, entry in entries.items()}
+        self.profiles = sorted(self.profile_names)
+        self.invalidate_reports()
+        return self.profiles
+
+    # Billable hours of each weekday in a range report; five make the 40 hour week
+    BILLABLE_HOURS_PER_WEEKDAY = 8
+
+    # Settings copied into every fleet shard, so shards ingest like this analyzer
+    FLEET_SETTINGS = (
+        'db_access_mode', 'ingest_mode', 'chunk_size', 'memory_limit_mb',
+        'storage_layout', 'rollup_granularity', 'idle_cap_minutes'
+    )
+
+    def is_user_data_dir(self, path):
+        """Check whether path looks like a User Data folder (Local State or profile directories)"""
+        if os.path.isfile(os.path.join(path, 'Local State')):
+            return True
+        try:
+            return any(self.parse_profile_dir(entry) is not None for entry in os.listdir(path))
+        except OSError:
+            return False
+
+    def discover_fleet(self, root, browser_type=None):
+        """List (user, user_data_dir) for every collected user folder directly under root.
+
+        A user folder may be the User Data folder itself, or a copy of the
+        user's home directory containing the browser's usual User Data path.
+        """
+        browser_type = browser_type or self.browser_type
+        relative_path = os.path.join(*self.BROWSER_PATHS[browser_type]['path'].split('\\'))
+        users = []
+        for user in sorted(os.listdir(root)):
+            user_dir = os.path.join(root, user)
+            if not os.path.isdir(user_dir):
+                continue
+            for candidate in (user_dir, os.path.join(user_dir, relative_path)):
+                if self.is_user_data_dir(candidate):
+                    users.append((user, candidate))
+                    break
+        return users
+
+    def analyze_fleet(self, root, browser_type=None, max_workers=None):
+        """Ingest every user and profile collected under root on a process pool.
+
+        Each (user, profile) pair is a shard that ingest_fleet_shard turns
+        into a rollup in a worker process; only the rollups travel back and
+        are merged into fleet_rollup, which has user and profile columns in
+        front of the usual rollup columns. Shards never use the visit cache,
+        as it is keyed by profile only. Returns fleet_rollup.
+        """
+        browser_type = browser_type or self.browser_type
+        settings = {name: getattr(self, name) for name in self.FLEET_SETTINGS}
+        tasks = []
+        self.fleet_profile_names = {}
+        for user, base_path in self.discover_fleet(root, browser_type):
+            scanner = BrowserHistoryAnalyzer(use_cache=False)
+            scanner.set_browser(browser_type, base_path)
+            for profile in scanner.profiles:
+                self.fleet_profile_names[(user, profile)] = scanner.get_profile_name(profile)
+                path = scanner.get_profile_path(profile)
+                tasks.append((os.path.getsize(path), (user, base_path, browser_type, profile, settings)))
+
+        frames = []
+        if tasks:
+            # Imported here since multiprocessing is slow to import and only fleet runs need it
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Largest histories first, so a big one does not start last and hold up the merge
+            tasks = [task for _, task in sorted(tasks, key=lambda t: t[0], reverse=True)]
+            workers = max(1, min(max_workers or os.cpu_count() or 1, len(tasks)))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(ingest_fleet_shard, task): task for task in tasks}
+                for future in as_completed(futures):
+                    user, _, _, profile, _ = futures[future]
+                    try:
+                        rollup = future.result()
+                    except Exception as e:
+                        print(f"Error analyzing {user} profile {profile}: {str(e)}")
+                        continue
+                    if rollup is not None and not rollup.empty:
+                        frames.append(rollup)
+
+        if frames:
+            self.fleet_rollup = pd.concat(frames, ignore_index=True)
+        else:
+            self.fleet_rollup = pd.DataFrame(
+                columns=['user', 'profile', 'week', 'period', 'domain'] + self.ROLLUP_MEASURES
+            )
+        self.invalidate_reports()
+        return self.fleet_rollup
+
+    def generate_fleet_report(self, week_offset=0):
+        """Return hours per user and profile for a week across the fleet, or None.
+
+        Each user's 40 hour week is split among their own profiles in
+        proportion to usage, leaving out excluded_profiles.
+        """
+        if self.fleet_rollup is None:
+            return None
+        week_start = pd.Timestamp(self.get_week_bounds(week_offset)[0])
+        week = self.fleet_rollup[self.fleet_rollup['week'] == week_start]
+        if self.excluded_profiles:
+            week = week[~week['profile'].isin(self.excluded_profiles)]
+        if week.empty:
+            return None
+
+        report = week.groupby(['user', 'profile']).agg(
+            visit_duration=(self.get_duration_column(), 'sum'),
+            visits=('visits', 'sum')
+        ).reset_index()
+        report.insert(2, 'profile_name', [
+            self.fleet_profile_names.get((user, profile), self.get_profile_dir(profile))
+            for user, profile in zip(report['user'], report['profile'])
+        ])
+        report['hours'] = report['visit_duration'] / (1000000 * 3600)
+        user_hours = report.groupby('user')['hours'].transform('sum')
+        report['billing_hours'] = (report['hours'] / user_hours * 40).round(2)
+        return report[['user', 'profile', 'profile_name', 'hours', 'visits', 'billing_hours']]
+
+    def get_week_bounds(self, week_offset=0):
+        """Return the local (start, end) datetimes of the week week_offset weeks ago"""
         now = datetime.now()
         week_start = now - timedelta(days=now.weekday() + (7 * week_offset))
         week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
         week_end = week_start + timedelta(days=7)
+        return week_start, week_end
+
+    def datetime_to_chrome_time(self, dt):
+        """Convert a local datetime to Chrome time format"""
+        return int(round((dt.timestamp() + 11644473600) * 1000000))
+
+    def get_week_data(self, df, week_offset=0):
+        """Filter dataframe for a specific week's data"""
+        week_start, week_end = self.get_week_bounds(week_offset)
+        if self.is_compact(df):
+            week_start = self.datetime_to_chrome_time(week_start)
+            week_end = self.datetime_to_chrome_time(week_end)
         return df[(df['visit_time'] >= week_start) & (df['visit_time'] < week_end)]
 
-    def generate_time_report(self, week_offset=0, exclude_profiles=None):
-        all_data = []
-        for profile, df in self.history_data.items():
+    def query_week_visits(self, profile_num, week_offset=0):
+        """Load one week of visits for a profile, filtering in SQLite on visits.visit_time"""
+        week_start, week_end = self.get_week_bounds(week_offset)
+        conn, temp_db = self.connect_to_db(self.get_profile_path(profile_num))
+        try:
+            df = pd.read_sql_query(
+                """
+                SELECT
+                    urls.url,
+                    urls.title,
+                    visits.visit_time,
+                    visits.visit_duration
+                FROM visits
+                JOIN urls ON urls.id = visits.url
+                WHERE visits.visit_time >= ? AND visits.visit_time < ?
+                """,
+                conn,
+                params=(self.datetime_to_chrome_time(week_start), self.datetime_to_chrome_time(week_end))
+            )
+        finally:
+            conn.close()
+            self.cleanup_temp_db(temp_db)
+
+        df['visit_time'] = self.convert_chrome_times(df['visit_time'])
+        df = df.dropna(subset=['visit_time'])
+        df['domain'] = self.extract_domains(df['url'])
+        return df
+
+    def query_week_domain_totals(self, profile_num, week_offset=0):
+        """Aggregate one week of visits per domain inside SQLite.
+
+        SQLite groups by URL, so only one row per distinct URL comes back and
+        is folded into its domain here.
+        """
+        week_start, week_end = self.get_week_bounds(week_offset)
+        conn, temp_db = self.connect_to_db(self.get_profile_path(profile_num))
+        try:
+            df = pd.read_sql_query(
+                """
+                SELECT
+                    urls.url,
+                    COUNT(*) AS visit_time,
+                    SUM(visits.visit_duration) AS visit_duration
+                FROM visits
+                JOIN urls ON urls.id = visits.url
+                WHERE visits.visit_time >= ? AND visits.visit_time < ?
+                GROUP BY visits.url
+                """,
+                conn,
+                params=(self.datetime_to_chrome_time(week_start), self.datetime_to_chrome_time(week_end))
+            )
+        finally:
+            conn.close()
+            self.cleanup_temp_db(temp_db)
+
+        df['domain'] = self.extract_domains(df['url'])
+        return df.groupby('domain', observed=True).agg({
+            'visit_time': 'sum',
+            'visit_duration': 'sum'
+        }).reset_index()
+
+    def build_profile_rollup(self, df, granularity=None, carry=None):
+        """Aggregate one profile's visits into (week, period, domain) buckets in one groupby pass.
+
+        period is the start of the day or hour bucket, or the week itself
+        when granularity is 'week'. Besides the raw visit_duration sum, each
+        bucket gets active_duration, the visit time left after merging
+        overlapping visits (see compute_active_durations). carry is passed
+        through to compute_active_durations when visits arrive in chunks.
+        """
+        granularity = granularity or self.rollup_granularity
+        compact = self.is_compact(df)
+        times = self.convert_chrome_times(df['visit_time']) if compact else df['visit_time']
+        days = times.dt.normalize()
+        weeks = days - pd.to_timedelta(times.dt.weekday, unit='D')
+        if granularity == 'hour':
+            periods = times.dt.floor('h')
+        elif granularity == 'day':
+            periods = days
+        else:
+            periods = weeks
+
+        durations = pd.to_numeric(df['visit_duration']).fillna(0).astype('int64')
+        starts = times.to_numpy().astype('datetime64[us]').astype('int64')
+        values = pd.DataFrame({
+            'visits': np.ones(len(df), dtype='int64'),
+            'visit_duration': durations,
+            'active_duration': self.compute_active_durations(starts, durations.to_numpy(), carry),
+        }, index=df.index)
+
+        rollup = values.groupby(
+            [weeks.rename('week'), periods.rename('period'), df['domain']], observed=True
+        ).agg({measure: 'sum' for measure in self.ROLLUP_MEASURES}).reset_index()
+        if compact:
+            rollup['domain'] = self.domain_dictionary.decode(rollup['domain'])
+        else:
+            rollup['domain'] = rollup['domain'].astype(object)
+        return rollup
+
+    def compute_active_durations(self, starts, durations, carry=None):
+        """Split the union of a profile's visit intervals among its visits.
+
+        Each visit covers [start, start + duration), with the duration capped
+        at idle_cap_minutes so a forgotten tab does not count for hours. After
+        sorting by start, a visit is credited only with the part of its
+        interval that lies past the furthest end of all earlier visits. The
+        credits therefore add up to the length of the merged intervals, and
+        parallel tabs are counted once.
+
+        carry holds the furthest end seen so far ({'end': ...}) for callers
+        that feed visits in time-ordered chunks; it is updated in place.
+        Returns the credited microseconds in the original order.
+        """
+        active = np.zeros(len(starts), dtype='int64')
+        if len(starts) == 0:
+            return active
+        cap = int(self.idle_cap_minutes * 60 * 1000000)
+        order = np.argsort(starts, kind='stable')
+        sorted_starts = starts[order]
+        ends = sorted_starts + np.clip(durations[order], 0, cap)
+
+        previous_end = carry.get('end') if carry else None
+        if previous_end is None:
+            previous_end = np.iinfo('int64').min
+        # Furthest end among all visits before each one
+        reach = np.maximum.accumulate(np.concatenate(([previous_end], ends)))
+        active[order] = np.clip(ends - np.maximum(sorted_starts, reach[:-1]), 0, None)
+        if carry is not None:
+            carry['end'] = int(reach[-1])
+        return active
+
+    def get_rollup(self):
+        """Return the (week, period, profile, domain) rollup of all ingested profiles.
+
+        The rollup is rebuilt only when the data version, browser or
+        granularity changes, so reports for any week are lookups into it.
+        Rebuilding only rolls up profiles whose data changed (see
+        get_profile_rollup) and concatenates the rest.
+        """
+        key = (self.browser_type, self.rollup_granularity, self.idle_cap_minutes, self.data_version)
+        if self.rollup_cache.get('key') != key:
+            frames = [
+                self.get_profile_rollup(profile, data)
+                for store in (self.history_data, self.profile_rollups)
+                for profile, data in store.items()
+            ]
+            current = {(self.browser_type, profile) for profile in self.history_data}
+            current.update((self.browser_type, profile) for profile in self.profile_rollups)
+            for cache_key in [k for k in self.profile_rollup_cache if k[0] == self.browser_type and k not in current]:
+                del self.profile_rollup_cache[cache_key]
+            if frames:
+                rollup = pd.concat(frames, ignore_index=True)
+            else:
+                rollup = pd.DataFrame(columns=['week', 'period', 'profile', 'domain'] + self.ROLLUP_MEASURES)
+            self.rollup_cache = {
+                'key': key,
+                'rollup': rollup,
+                'weeks': {week: frame for week, frame in rollup.groupby('week')}
+            }
+        return self.rollup_cache['rollup']
+
+    def get_profile_rollup(self, profile, data):
+        """Rollup of one profile's visits or streamed rollup, with a profile column.
+
+        Kept in profile_rollup_cache until the profile's frame is replaced
+        or the granularity or idle cap changes. Frames are never modified in
+        place, so the frame itself identifies the data it was built from.
+        """
+        settings = (self.rollup_granularity, self.idle_cap_minutes)
+        cache_key = (self.browser_type, profile)
+        cached = self.profile_rollup_cache.get(cache_key)
+        if cached is not None and cached[0] is data and cached[1] == settings:
+            return cached[2]
+        if 'period' in data.columns:
+            rollup = self.coarsen_rollup(data, self.rollup_granularity)
+        else:
+            with self.timings.stage('rollup', profile) as stage:
+                rollup = self.build_profile_rollup(data)
+                stage.rows = len(data)
+        rollup.insert(2, 'profile', profile)
+        self.profile_rollup_cache[cache_key] = (data, settings, rollup)
+        return rollup
+
+    def coarsen_rollup(self, rollup, granularity):
+        """Re-bucket a streamed rollup to a coarser granularity (copies it either way)"""
+        current = rollup.attrs.get('granularity', granularity)
+        if rollup.attrs.get('idle_cap_minutes', self.idle_cap_minutes) != self.idle_cap_minutes:
+            print("Streamed data used a different idle cap; analyze again to apply the new one")
+        order = ['hour', 'day', 'week']
+        if current == granularity:
+            return rollup.copy()
+        if order.index(granularity) < order.index(current):
+            print(f"Streamed data has {current} buckets, cannot report by {granularity}")
+            return rollup.copy()
+        rollup = rollup.copy()
+        rollup['period'] = rollup['week'] if granularity == 'week' else rollup['period'].dt.normalize()
+        return rollup.groupby(['week', 'period', 'domain'], sort=False).agg({
+            measure: 'sum' for measure in self.ROLLUP_MEASURES
+        }).reset_index()
+
+    def get_rollup_week(self, week_start):
+        """Return the rollup rows of the week starting at week_start, or None"""
+        self.get_rollup()
+        return self.rollup_cache['weeks'].get(pd.Timestamp(week_start))
+
+    def get_duration_column(self):
+        """Rollup column reports sum for the current time_model"""
+        return 'active_duration' if self.time_model == 'interval' else 'visit_duration'
+
+    def iter_week_domain_totals(self, week_offset=0, exclude_profiles=None):
+        """Yield (profile, per-domain totals) for every profile with visits in the week.
+
+        The 'sql' report source sums raw visit durations, so it rejects the
+        'interval' time_model.
+        """
+        if self.report_source == 'sql':
+            if self.time_model == 'interval':
+                raise ValueError("The sql report source cannot use the interval time model")
+            for profile in self.profiles:
+                if exclude_profiles and profile in exclude_profiles:
+                    continue
+                try:
+                    profile_data = self.query_week_domain_totals(profile, week_offset)
+                except Exception as e:
+                    print(f"Error querying profile {profile}: {str(e)}")
+                    continue
+                if not profile_data.empty:
+                    yield profile, profile_data
+            return
+
+        week_start, _ = self.get_week_bounds(week_offset)
+        week = self.get_rollup_week(week_start)
+        if week is None:
+            return
+
+        for profile, rollup in week.groupby('profile', sort=False):
             if exclude_profiles and profile in exclude_profiles:
                 continue
-                
-            df = self.get_week_data(df, week_offset)
-            
-            if df.empty:
-                continue
-                
-            profile_data = df.groupby('domain').agg({
-                'visit_time': 'count',
-                'visit_duration': 'sum'
+            profile_data = rollup.groupby('domain').agg({
+                'visits': 'sum',
+                self.get_duration_column(): 'sum'
+            }).rename(columns={
+                'visits': 'visit_time', self.get_duration_column(): 'visit_duration'
             }).reset_index()
+            yield profile, profile_data
+
+    def generate_trend_report(self, week_offsets=range(12), exclude_profiles=None):
+        """Return hours per profile for several weeks at once, one row per week.
+
+        All weeks are read from the rollup, so this costs about the same as
+        a single-week report.
+        """
+        week_starts = [pd.Timestamp(self.get_week_bounds(offset)[0]) for offset in week_offsets]
+        rollup = self.get_rollup()
+        rollup = rollup[rollup['week'].isin(week_starts)]
+        if exclude_profiles:
+            rollup = rollup[~rollup['profile'].isin(exclude_profiles)]
+        if rollup.empty:
+            return None
+
+        trend = rollup.groupby(['week', 'profile'])[self.get_duration_column()].sum().unstack(fill_value=0)
+        trend = trend / (1000000 * 3600)
+        trend = trend.reindex(sorted(week_starts), fill_value=0)
+        trend.columns = [self.get_profile_name(profile) for profile in trend.columns]
+        return trend
+
+    def generate_time_report(self, week_offset=0, exclude_profiles=None):
+        """Return (total_time, profile_summary) for a week.
+
+        Reports are memoized per browser, week, exclusions and data version,
+        so billing and both charts share one computation. The returned
+        DataFrames are shared and must not be modified in place.
+        """
+        key = (
+            self.browser_type, self.report_source, self.time_model, self.idle_cap_minutes,
+            week_offset, tuple(sorted(exclude_profiles or ())), self.data_version
+        )
+        report = self.report_cache.get(key)
+        if report is None:
+            with self.timings.stage('report'):
+                report = self.build_time_report(week_offset, exclude_profiles)
+            self.report_cache[key] = report
+        return report
+
+    def build_time_report(self, week_offset=0, exclude_profiles=None):
+        all_data = []
+        for profile, profile_data in self.iter_week_domain_totals(week_offset, exclude_profiles):
             profile_data['profile'] = profile
-            profile_data['profile_name'] = self.profile_names.get(profile, f'Profile {profile}')
+            profile_data['profile_name'] = self.get_profile_name(profile)
             all_data.append(profile_data)
         
         if all_data:
             combined_data = pd.concat(all_data)
-            # Convert visit_duration from microseconds to hours
-            combined_data['hours'] = combined_data['visit_duration'].fillna(0) / (1000000 * 3600)
+            combined_data['visit_duration'] = combined_data['visit_duration'].fillna(0)
             
             # Group by domain across all profiles
-            total_time = combined_data.groupby('domain').agg({
-                'hours': 'sum',
+            total_time = combined_data.groupby('domain', observed=True).agg({
+                'visit_duration': 'sum',
                 'visit_time': 'sum'
-            }).sort_values('hours', ascending=False)
+            })
             
             # Also generate per-profile summary
             profile_summary = combined_data.groupby(['profile', 'profile_name']).agg({
-                'hours': 'sum',
+                'visit_duration': 'sum',
                 'visit_time': 'sum'
-            }).sort_values('hours', ascending=False)
+            })
+            
+            # Convert visit_duration from microseconds to hours only after
+            # summing, so the totals do not depend on the order rows arrive in
+            total_time, profile_summary = [
+                summary.assign(hours=summary['visit_duration'] / (1000000 * 3600))[['hours', 'visit_time']]
+                .sort_values('hours', ascending=False)
+                for summary in (total_time, profile_summary)
+            ]
             
             return total_time, profile_summary
         return None, None
 
+    def parse_date_range(self, start, end):
+        """Return local (start, end) Timestamps for the days start to end, end included"""
+        start = pd.Timestamp(start).normalize()
+        end = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        if end <= start:
+            raise ValueError("The end date must not be before the start date")
+        return start, end
+
+    def get_bucket_starts(self, times, granularity):
+        """Start of the day, week or month bucket each time falls in"""
+        days = times.dt.normalize()
+        if granularity == 'day':
+            return days
+        if granularity == 'week':
+            return days - pd.to_timedelta(times.dt.weekday, unit='D')
+        if granularity == 'month':
+            return days.dt.to_period('M').dt.start_time
+        raise ValueError(f"Unknown granularity: {granularity}")
+
+    def generate_range_report(self, start, end, granularity='week'):
+        """Return hours and billing per bucket and profile for a date range, or None.
+
+        start and end are dates, both included; granularity is 'day', 'week'
+        or 'month'. Reports are memoized like generate_time_report, and the
+        returned DataFrame is shared and must not be modified in place.
+        """
+        start, end = self.parse_date_range(start, end)
+        key = (
+            'range', self.browser_type, self.time_model, self.idle_cap_minutes, start, end,
+            granularity, tuple(sorted(self.excluded_profiles)), self.data_version
+        )
+        report = self.report_cache.get(key)
+        if report is None:
+            with self.timings.stage('range_report'):
+                report = self.build_range_report(start, end, granularity)
+            self.report_cache[key] = report
+        return report
+
+    def build_range_report(self, start, end, granularity):
+        """Compute every bucket of a range with one filter and one groupby over the rollup.
+
+        The cost grows with the rollup rows, not with the number of buckets.
+        Each bucket's billable hours (BILLABLE_HOURS_PER_WEEKDAY for each
+        weekday of the bucket inside the range, so 40 for a full week) are
+        split among profiles in proportion to usage, leaving out
+        excluded_profiles. Every bucket of the range gets a row per profile,
+        with zeros for idle ones.
+        """
+        if granularity not in ('day', 'week', 'month'):
+            raise ValueError(f"Unknown granularity: {granularity}")
+        streamed = [r.attrs.get('granularity') for r in self.profile_rollups.values()]
+        if self.rollup_granularity == 'week' or 'week' in streamed:
+            raise ValueError("Range reports need day or hour rollups")
+
+        rollup = self.get_rollup()
+        rollup = rollup[(rollup['period'] >= start) & (rollup['period'] < end)]
+        if self.excluded_profiles:
+            rollup = rollup[~rollup['profile'].isin(self.excluded_profiles)]
+        if rollup.empty:
+            return None
+
+        days = pd.Series(pd.date_range(start, end - pd.Timedelta(days=1), freq='D'))
+        billable = (days.dt.weekday < 5).groupby(self.get_bucket_starts(days, granularity)).sum()
+        billable = billable * self.BILLABLE_HOURS_PER_WEEKDAY
+
+        totals = rollup.groupby(
+            [self.get_bucket_starts(rollup['period'], granularity).rename('bucket'), 'profile']
+        ).agg(duration=(self.get_duration_column(), 'sum'), visits=('visits', 'sum'))
+        profiles = sorted(totals.index.get_level_values('profile').unique())
+        index = pd.MultiIndex.from_product([billable.index, profiles], names=['bucket', 'profile'])
+        report = totals.reindex(index, fill_value=0).reset_index()
+
+        report.insert(2, 'profile_name', [self.get_profile_name(p) for p in report['profile']])
+        report['hours'] = report['duration'] / (1000000 * 3600)
+        bucket_hours = report.groupby('bucket')['hours'].transform('sum')
+        share = (report['hours'] / bucket_hours.where(bucket_hours > 0)).fillna(0)
+        report['billing_hours'] = (share * report['bucket'].map(billable)).round(2)
+        return report[['bucket', 'profile', 'profile_name', 'hours', 'visits', 'billing_hours']]
+
+    def format_bucket(self, bucket, granularity):
+        if granularity == 'month':
+            return f"{bucket:%Y-%m}"
+        return f"{bucket:%Y-%m-%d}"
+
     def calculate_billing_distribution(self, week_offset=0):
         """Calculate billing hours based on 40-hour week proportional to usage"""
         _, profile_summary = self.generate_time_report(
@@ -196,55 +1975,544 @@ class BrowserHistoryAnalyzer:
         )
         
         if profile_summary is not None and not profile_summary.empty:
+            profile_summary = profile_summary.copy()
             total_hours = profile_summary['hours'].sum()
             profile_summary['billing_hours'] = (profile_summary['hours'] / total_hours * 40).round(2)
             return profile_summary
         return None
 
-    def create_top_sites_plot(self, n=10, week_offset=0):
-        """Create a matplotlib figure for top sites"""
+    def calculate_browsers_billing(self, browser_types=None, week_offset=0):
+        """Split the 40-hour week among the profiles of several browsers at once.
+
+        browser_types defaults to every browser with ingested data, as left
+        by analyze_browsers. excluded_profiles only applies to the current
+        browser. Returns None when no browser has visits in the week.
+        """
+        if browser_types is None:
+            browser_types = [b for b in self.BROWSER_PATHS if self.browser_history.get(b) or self.browser_rollups.get(b)]
+        frames = []
+        for browser_type in browser_types:
+            scanner = self.for_browser(browser_type)
+            # Shared so rollups of the other browsers are not rebuilt on every call
+            scanner.profile_rollup_cache = self.profile_rollup_cache
+            excluded = self.excluded_profiles if browser_type == self.browser_type else None
+            _, profile_summary = scanner.generate_time_report(week_offset, excluded)
+            if profile_summary is not None and not profile_summary.empty:
+                frames.append(pd.concat({browser_type: profile_summary}, names=['browser']))
+        if not frames:
+            return None
+        billing = pd.concat(frames).sort_values('hours', ascending=False)
+        billing['billing_hours'] = (billing['hours'] / billing['hours'].sum() * 40).round(2)
+        return billing
+
+    def set_billing_rules(self, rules):
+        """Use a BillingRules instance (or None) for generate_bucket_report"""
+        self.billing_rules = rules
+        self.invalidate_reports()
+
+    def split_by_path_rules(self, profile, totals, week_offset):
+        """Split a profile's per-domain totals among the buckets of its URL path rules.
+
+        totals has domain, visits, duration and domain-level bucket columns
+        for domains whose bucket depends on the URL path. Each domain's totals are divided in
+        proportion to the visits and visit durations of its URLs in each
+        bucket, so the profile's totals are unchanged under either
+        time_model. Compact visits have no URLs, so the week's URLs are read
+        back from the History database. Returns None when no URLs are
+        available, as for streamed or exported data.
+        """
+        df = self.history_data.get(profile)
+        if df is None:
+            return None
+        if 'url' in df.columns:
+            visits = self.get_week_data(df, week_offset)
+        else:
+            try:
+                visits = self.query_week_visits(profile, week_offset)
+            except Exception as e:
+                print(f"Error reading URLs of profile {profile}: {str(e)}")
+                return None
+        visits = visits[visits['domain'].isin(totals['domain'])]
+        if visits.empty:
+            return None
+
+        # Each distinct URL is matched once
+        url_codes, unique_urls = pd.factorize(visits['url'])
+        url_domains = pd.Series(visits['domain'].to_numpy(), index=url_codes).groupby(level=0).first()
+        url_buckets = np.array([
+            self.billing_rules.match(url_domains[i], urlparse(url).path)
+            for i, url in enumerate(unique_urls)
+        ], dtype=object)
+        by_bucket = pd.DataFrame({
+            'domain': visits['domain'].astype(object).to_numpy(),
+            'bucket': url_buckets[url_codes],
+            'count': 1,
+            'raw_duration': pd.to_numeric(visits['visit_duration']).fillna(0).to_numpy(),
+        }).groupby(['domain', 'bucket'], sort=False).sum().reset_index()
+
+        domain_count = by_bucket.groupby('domain')['count'].transform('sum')
+        domain_raw = by_bucket.groupby('domain')['raw_duration'].transform('sum')
+        count_share = by_bucket['count'] / domain_count
+        duration_share = (by_bucket['raw_duration'] / domain_raw.where(domain_raw > 0)).fillna(count_share)
+        split = by_bucket[['domain', 'bucket']].merge(totals.drop(columns='bucket'), on='domain')
+        split['visits'] = split['visits'] * count_share.to_numpy()
+        split['duration'] = split['duration'] * duration_share.to_numpy()
+        # Domains without visits in the week's URLs keep their domain-level bucket
+        return pd.concat([split, totals[~totals['domain'].isin(by_bucket['domain'])]], ignore_index=True)
+
+    def generate_bucket_report(self, week_offset=0):
+        """Return hours per billing bucket for a week across all profiles, or None.
+
+        Every distinct domain of the week is resolved once through
+        billing_rules. Only domains with URL path rules are looked at URL by
+        URL. excluded_profiles are left out, and the 40 hour week is split
+        among buckets in proportion to their hours.
+        """
+        if self.billing_rules is None:
+            return None
+        week_start, _ = self.get_week_bounds(week_offset)
+        week = self.get_rollup_week(week_start)
+        if week is None:
+            return None
+        if self.excluded_profiles:
+            week = week[~week['profile'].isin(self.excluded_profiles)]
+        if week.empty:
+            return None
+
+        totals = week.groupby(['profile', 'domain'], sort=False).agg(
+            visits=('visits', 'sum'), duration=(self.get_duration_column(), 'sum')
+        ).reset_index()
+        resolved = {domain: self.billing_rules.resolve(domain) for domain in totals['domain'].unique()}
+        totals['bucket'] = totals['domain'].map({domain: c[-1][1] for domain, c in resolved.items()})
+
+        path_domains = [domain for domain, c in resolved.items() if len(c) > 1]
+        if path_domains:
+            needs_path = totals['domain'].isin(path_domains)
+            frames = [totals[~needs_path]]
+            for profile, profile_totals in totals[needs_path].groupby('profile', sort=False):
+                split = self.split_by_path_rules(profile, profile_totals, week_offset)
+                if split is None:
+                    print(f"URL path rules need the visited URLs; "
+                          f"{self.get_profile_name(profile)} is billed by domain only")
+                    split = profile_totals
+                frames.append(split)
+            totals = pd.concat(frames, ignore_index=True)
+
+        report = totals.groupby('bucket').agg({'duration': 'sum', 'visits': 'sum'})
+        report['hours'] = report['duration'] / (1000000 * 3600)
+        report['visits'] = report['visits'].round().astype('int64')
+        total_hours = report['hours'].sum()
+        report['billing_hours'] = (report['hours'] / total_hours * 40).round(2) if total_hours else 0.0
+        return report[['hours', 'visits', 'billing_hours']].sort_values('hours', ascending=False)
+
+    def get_week_label(self, week_offset=0):
+        return "Current Week" if week_offset == 0 else f"Week {-week_offset} ago"
+
+    def get_top_sites_chart(self, n=10, week_offset=0):
+        """Bar chart data for the top sites of a week, or None without data"""
         total_time, _ = self.generate_time_report(week_offset)
         if total_time is None:
             return None
-        
-        fig = Figure(figsize=(8, 4))
-        ax = fig.add_subplot(111)
-        
         top_sites = total_time.head(n)
-        ax.bar(range(len(top_sites)), top_sites['hours'])
-        ax.set_xticks(range(len(top_sites)))
-        ax.set_xticklabels(top_sites.index, rotation=45, ha='right')
-        
-        week_str = "Current Week" if week_offset == 0 else f"Week {-week_offset} ago"
-        ax.set_title(f'Top {n} Sites by Time Spent ({week_str})')
-        ax.set_xlabel('Domain')
-        ax.set_ylabel('Hours')
-        
+        return {
+            'labels': list(top_sites.index),
+            'values': top_sites['hours'].tolist(),
+            'title': f'Top {n} Sites by Time Spent ({self.get_week_label(week_offset)})',
+            'xlabel': 'Domain',
+            'ylabel': 'Hours',
+        }
+
+    def get_profile_usage_chart(self, week_offset=0):
+        """Bar chart data for the time spent per profile in a week, or None without data"""
+        _, profile_summary = self.generate_time_report(week_offset)
+        if profile_summary is None:
+            return None
+        return {
+            'labels': [f"{row[1]} ({row[0]})" for row in profile_summary.index],
+            'values': profile_summary['hours'].tolist(),
+            'title': f'Time Spent per Profile ({self.get_week_label(week_offset)})',
+            'xlabel': 'Profile',
+            'ylabel': 'Hours',
+        }
+
+    def create_bar_figure(self, chart):
+        fig = matplotlib_figure.Figure(figsize=(8, 4))
+        ax = fig.add_subplot(111)
+        ax.bar(range(len(chart['values'])), chart['values'])
+        ax.set_xticks(range(len(chart['labels'])))
+        ax.set_xticklabels(chart['labels'], rotation=45, ha='right')
+        ax.set_title(chart['title'])
+        ax.set_xlabel(chart['xlabel'])
+        ax.set_ylabel(chart['ylabel'])
         fig.tight_layout()
         return fig
 
+    def create_top_sites_plot(self, n=10, week_offset=0):
+        """Create a matplotlib figure for top sites"""
+        chart = self.get_top_sites_chart(n, week_offset)
+        return self.create_bar_figure(chart) if chart else None
+
     def create_profile_usage_plot(self, week_offset=0):
         """Create a matplotlib figure for profile usage"""
-        _, profile_summary = self.generate_time_report(week_offset)
-        if profile_summary is None:
+        chart = self.get_profile_usage_chart(week_offset)
+        return self.create_bar_figure(chart) if chart else None
+
+    def get_range_trend_chart(self, start, end, granularity='week'):
+        """Line chart data of hours per profile for each bucket of a date range, or None"""
+        report = self.generate_range_report(start, end, granularity)
+        if report is None:
             return None
-        
-        fig = Figure(figsize=(8, 4))
+        trend = report.pivot(index='bucket', columns='profile_name', values='hours')
+        return {
+            'labels': [self.format_bucket(bucket, granularity) for bucket in trend.index],
+            'series': {name: trend[name].tolist() for name in trend.columns},
+            'title': f'Time Spent per Profile by {granularity.capitalize()}',
+            'xlabel': granularity.capitalize(),
+            'ylabel': 'Hours',
+        }
+
+    def get_range_usage_chart(self, start, end, granularity='week'):
+        """Bar chart data for the time spent per profile over a whole date range, or None"""
+        report = self.generate_range_report(start, end, granularity)
+        if report is None:
+            return None
+        start, end = self.parse_date_range(start, end)
+        totals = report.groupby(['profile', 'profile_name'])['hours'].sum().sort_values(ascending=False)
+        return {
+            'labels': [f"{name} ({profile})" for profile, name in totals.index],
+            'values': totals.tolist(),
+            'title': f'Time Spent per Profile ({start:%Y-%m-%d} to {end - pd.Timedelta(days=1):%Y-%m-%d})',
+            'xlabel': 'Profile',
+            'ylabel': 'Hours',
+        }
+
+    def create_range_trend_plot(self, start, end, granularity='week'):
+        """Create a matplotlib figure with one line of hours per profile over a date range"""
+        chart = self.get_range_trend_chart(start, end, granularity)
+        if not chart:
+            return None
+        fig = matplotlib_figure.Figure(figsize=(8, 4))
         ax = fig.add_subplot(111)
-        
-        profile_names = [f"{row[1]} ({row[0]})" for row in profile_summary.index]
-        ax.bar(range(len(profile_names)), profile_summary['hours'])
-        ax.set_xticks(range(len(profile_names)))
-        ax.set_xticklabels(profile_names, rotation=45, ha='right')
-        
-        week_str = "Current Week" if week_offset == 0 else f"Week {-week_offset} ago"
-        ax.set_title(f'Time Spent per Profile ({week_str})')
-        ax.set_xlabel('Profile')
-        ax.set_ylabel('Hours')
-        
+        for name, values in chart['series'].items():
+            ax.plot(range(len(values)), values, marker='o', label=name)
+        ax.set_xticks(range(len(chart['labels'])))
+        ax.set_xticklabels(chart['labels'], rotation=45, ha='right')
+        ax.set_title(chart['title'])
+        ax.set_xlabel(chart['xlabel'])
+        ax.set_ylabel(chart['ylabel'])
+        ax.legend()
         fig.tight_layout()
         return fig
 
+def ingest_fleet_shard(task):
+    """Ingest one collected profile into its rollup; runs in a fleet worker process.
+
+    task is (user, user_data_dir, browser_type, profile, settings) as built by
+    BrowserHistoryAnalyzer.analyze_fleet. Returns the rollup with user and
+    profile columns, or None when the profile could not be read.
+    """
+    user, base_path, browser_type, profile, settings = task
+    analyzer = BrowserHistoryAnalyzer(use_cache=False, max_workers=1)
+    for name, value in settings.items():
+        setattr(analyzer, name, value)
+    analyzer.set_browser(browser_type, base_path)
+    result, _ = analyzer.ingest_profile(profile)
+    if not analyzer.store_profile_result(profile, result):
+        return None
+    rollup = analyzer.get_rollup().drop(columns='profile')
+    rollup.insert(0, 'user', user)
+    rollup.insert(1, 'profile', profile)
+    return rollup
+
+class ReportService:
+    """Keeps an analyzer's data warm and answers report queries from many threads.
+
+    Requests read an immutable snapshot: a refresh ingests changed profiles
+    into a copy of the current analyzer, warms its reports and then swaps it
+    in, so readers never see half-updated data or wait on ingestion.
+    Encoded responses are cached per snapshot.
+    """
+
+    # Encoded responses kept per snapshot before the least recently used go
+    RESPONSE_CACHE_SIZE = 1024
+
+    def __init__(self, analyzer, refresh_interval=60, week_offsets=range(2)):
+        self.state = (analyzer, LRUCache(self.RESPONSE_CACHE_SIZE))
+        self.refresh_interval = refresh_interval
+        self.week_offsets = week_offsets
+        self.refreshed_at = None
+        self.refresh_count = 0
+        self.refresh_lock = threading.Lock()
+        self.refresh_requested = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def analyzer(self):
+        return self.state[0]
+
+    def refresh(self):
+        """Ingest changed profiles into a new snapshot; returns True if the data changed"""
+        with self.refresh_lock:
+            current = self.analyzer
+            scanner = copy.copy(current)
+            # Unchanged profiles keep their DataFrames, which are never modified in place
+            scanner.browser_history = {b: dict(h) for b, h in current.browser_history.items()}
+            scanner.browser_rollups = {b: dict(r) for b, r in current.browser_rollups.items()}
+            scanner.file_stats = dict(current.file_stats)
+            scanner.report_cache = LRUCache(scanner.REPORT_CACHE_SIZE)
+            scanner.rollup_cache = {}
+            scanner.profile_rollup_cache = dict(current.profile_rollup_cache)
+            scanner.set_browser(current.browser_type, current.base_path)
+            before = (set(scanner.history_data), set(scanner.profile_rollups))
+            scanner.analyze_all_profiles()
+            after = (set(scanner.history_data), set(scanner.profile_rollups))
+
+            changed = self.refreshed_at is None or scanner.data_version != current.data_version or before != after
+            if changed:
+                scanner.invalidate_reports()
+                for week_offset in self.week_offsets:
+                    scanner.generate_time_report(week_offset)
+                    scanner.calculate_billing_distribution(week_offset)
+                self.state = (scanner, LRUCache(self.RESPONSE_CACHE_SIZE))
+            self.refreshed_at = datetime.now()
+            self.refresh_count += 1
+            return changed
+
+    def start(self):
+        """Load the data, then keep refreshing it on a background thread"""
+        self.refresh()
+        self.thread = threading.Thread(target=self.refresh_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.refresh_requested.set()
+
+    def refresh_loop(self):
+        while not self.stop_event.is_set():
+            self.refresh_requested.wait(self.refresh_interval)
+            self.refresh_requested.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error during refresh: {str(e)}")
+
+    def get_status(self, analyzer):
+        return {
+            'browser': analyzer.browser_type,
+            'profiles': {str(p): analyzer.get_profile_name(p) for p in analyzer.profiles},
+            'data_version': analyzer.data_version,
+            'refreshed_at': self.refreshed_at.isoformat(timespec='seconds') if self.refreshed_at else None,
+            'refresh_count': self.refresh_count,
+        }
+
+    def query(self, path, params):
+        """Return (status, body bytes) for a GET request; safe to call from many threads"""
+        analyzer, responses = self.state
+        try:
+            time_model = params.get('time_model', [analyzer.time_model])[0]
+            if time_model not in ('duration', 'interval'):
+                raise ValueError(f"Unknown time_model: {time_model}")
+            # Responses are cached under the parameters each path reads, so
+            # unknown or repeated parameters cannot add entries
+            if path == '/status':
+                key = None
+            elif path in ('/report', '/top-sites', '/billing', '/buckets'):
+                week_offset = int(params.get('week', ['0'])[0])
+                if path == '/report':
+                    exclude = tuple(sorted({int(p) for value in params.get('exclude', []) for p in value.split(',') if p}))
+                    key = (path, time_model, week_offset, exclude)
+                elif path == '/top-sites':
+                    n = int(params.get('n', ['10'])[0])
+                    key = (path, time_model, week_offset, n)
+                else:
+                    key = (path, time_model, week_offset)
+            elif path == '/range':
+                start = params.get('start', [None])[0]
+                if start is None:
+                    raise ValueError("start is required")
+                end = params.get('end', [datetime.now().date().isoformat()])[0]
+                granularity = params.get('granularity', ['week'])[0]
+                key = (path, time_model, start, end, granularity)
+            else:
+                return 404, self.encode({'error': f"Unknown path: {path}"})
+
+            cached = responses.get(key) if key is not None else None
+            if cached is not None:
+                return cached
+
+            if time_model != analyzer.time_model:
+                # A shallow copy still shares report_cache, whose keys include time_model
+                analyzer = copy.copy(analyzer)
+                analyzer.time_model = time_model
+
+            if path == '/status':
+                body = self.get_status(analyzer)
+            elif path == '/report':
+                total_time, profile_summary = analyzer.generate_time_report(week_offset, list(exclude))
+                body = None if total_time is None else {
+                    'domains': self.to_records(total_time),
+                    'profiles': self.to_records(profile_summary),
+                }
+            elif path == '/top-sites':
+                total_time, _ = analyzer.generate_time_report(week_offset)
+                body = None if total_time is None else self.to_records(total_time.head(n))
+            elif path == '/billing':
+                billing = analyzer.calculate_billing_distribution(week_offset)
+                body = None if billing is None else self.to_records(billing)
+            elif path == '/range':
+                report = analyzer.generate_range_report(start, end, granularity)
+                body = None if report is None else self.to_records(report.set_index('bucket'))
+            else:
+                buckets = analyzer.generate_bucket_report(week_offset)
+                body = None if buckets is None else self.to_records(buckets)
+        except ValueError as e:
+            return 400, self.encode({'error': str(e)})
+        except Exception as e:
+            print(f"Error answering {path}: {str(e)}")
+            return 500, self.encode({'error': f"Internal error: {str(e)}"})
+
+        if body is None:
+            response = (404, self.encode({'error': "No data found for the selected period"}))
+        else:
+            response = (200, self.encode(body))
+        if key is not None:
+            responses[key] = response
+        return response
+
+    def to_records(self, df):
+        df = df.reset_index().rename(columns={'visit_time': 'visits'})
+        return json.loads(df.to_json(orient='records', date_format='iso'))
+
+    def encode(self, body):
+        return json.dumps(body).encode('utf-8')
+
+def create_report_server(service, host='127.0.0.1', port=8765, verbose=False):
+    """Create a ThreadingHTTPServer that answers ReportService queries as JSON.
+
+    http.server is imported here instead of at startup, since only the
+    report service needs it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class ReportRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes, which Nagle's algorithm
+        # would hold back on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            status, body = service.query(url.path, parse_qs(url.query))
+            self.send_body(status, body)
+
+        def do_POST(self):
+            if urlparse(self.path).path != '/refresh':
+                self.send_body(404, b'{"error": "Unknown path"}')
+                return
+            service.refresh_requested.set()
+            self.send_body(202, b'{"refresh": "requested"}')
+
+        def send_body(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.daemon_threads = True
+    return server
+
+class ChartView:
+    """A long-lived bar chart embedded in Tk whose bars are updated in place"""
+
+    def __init__(self, master):
+        # Constrained layout is redone on each draw, unlike a one-off tight_layout
+        self.figure = matplotlib_figure.Figure(figsize=(8, 4), constrained_layout=True)
+        self.ax = self.figure.add_subplot(111)
+        self.bars = None
+        self.labels = None
+        self.canvas = backend_tkagg.FigureCanvasTkAgg(self.figure, master=master)
+        self.visible = False
+        self.set_visible(True)
+
+    def set_visible(self, visible):
+        if visible and not self.visible:
+            self.canvas.get_tk_widget().pack(fill="both", expand=True, pady=5)
+        elif not visible and self.visible:
+            self.canvas.get_tk_widget().pack_forget()
+        self.visible = visible
+
+    def show(self, chart, empty_title="No data for the selected period"):
+        values = chart['values'] if chart else []
+        labels = chart['labels'] if chart else []
+        if self.bars is not None and len(self.bars) == len(values):
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.ax.bar(range(len(values)), values, color='C0')
+            self.ax.set_xticks(range(len(labels)))
+        if labels != self.labels:
+            self.ax.set_xticklabels(labels, rotation=45, ha='right')
+            self.labels = labels
+
+        self.ax.set_title(chart['title'] if chart else empty_title)
+        self.ax.set_xlabel(chart['xlabel'] if chart else '')
+        self.ax.set_ylabel(chart['ylabel'] if chart else '')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
+class TrendChartView(ChartView):
+    """A long-lived line chart with one line per series, updated in place"""
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.lines = {}
+
+    def show(self, chart, empty_title="No data for the selected period"):
+        series = chart['series'] if chart else {}
+        labels = chart['labels'] if chart else []
+        positions = range(len(labels))
+        if list(series) == list(self.lines):
+            for name, line in self.lines.items():
+                line.set_data(positions, series[name])
+        else:
+            for line in self.lines.values():
+                line.remove()
+            self.lines = {
+                name: self.ax.plot(positions, values, marker='o', label=name)[0]
+                for name, values in series.items()
+            }
+            legend = self.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            if self.lines:
+                self.ax.legend()
+        if labels != self.labels:
+            # Thin out the ticks so long ranges stay readable
+            step = max(1, len(labels) // 20)
+            self.ax.set_xticks(positions[::step])
+            self.ax.set_xticklabels(labels[::step], rotation=45, ha='right')
+            self.labels = labels
+
+        self.ax.set_title(chart['title'] if chart else empty_title)
+        self.ax.set_xlabel(chart['xlabel'] if chart else '')
+        self.ax.set_ylabel(chart['ylabel'] if chart else '')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
 class BrowserAnalyzerGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -252,7 +2520,56 @@ class BrowserAnalyzerGUI:
         self.root.geometry("1200x800")
         
         self.analyzer = BrowserHistoryAnalyzer()
+        self.analysis_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
+        self.analysis_state = None
+        self.startup_probe = None
         self.setup_gui()
+        # Runs once the main loop has drawn the window
+        self.root.after_idle(self.preload_libraries)
+
+    def preload_libraries(self):
+        """Import pandas, numpy and matplotlib on a background thread after the window is up.
+
+        The window does not wait for them, and they are usually loaded by the
+        time the first analysis needs them.
+        """
+        def load():
+            for module in (np, pd, matplotlib_figure):
+                try:
+                    module._load()
+                except ImportError:
+                    # Reported again where the module is actually used
+                    pass
+        threading.Thread(target=load, daemon=True).start()
+
+    def start_startup_probe(self, path, browser=None):
+        """Record when the window first appears and, given a browser, when its first report is shown.
+
+        The Unix times are written to path as JSON and the app then exits.
+        Used by benchmarks/startup.py, also with frozen builds that have no console.
+        """
+        self.startup_probe = {'path': path, 'times': {}}
+
+        def on_map(event):
+            if event.widget is self.root and 'window' not in self.startup_probe['times']:
+                self.startup_probe['times']['window'] = time.time()
+                if browser:
+                    self.browser_var.set(browser)
+                    self.update_profiles()
+                    self.analyze()
+                else:
+                    self.finish_startup_probe()
+
+        self.root.bind('<Map>', on_map, add='+')
+
+    def finish_startup_probe(self):
+        if 'window' in self.startup_probe['times']:
+            self.startup_probe['times'].setdefault('first_report', time.time())
+        with open(self.startup_probe['path'], 'w', encoding='utf-8') as f:
+            json.dump(self.startup_probe['times'], f)
+        self.root.destroy()
 
     def setup_gui(self):
         # Left panel for controls
@@ -267,17 +2584,56 @@ class BrowserAnalyzerGUI:
         for browser in self.analyzer.BROWSER_PATHS.keys():
             ttk.Radiobutton(browser_frame, text=browser, value=browser, 
                           variable=self.browser_var, command=self.update_profiles).pack(anchor="w")
+        self.all_browsers = tk.BooleanVar(value=False)
+        ttk.Checkbutton(browser_frame, text="Bill all browsers together", variable=self.all_browsers,
+                        command=self.on_view_change).pack(anchor="w", pady=(5, 0))
         
-        # Week selection
-        week_frame = ttk.LabelFrame(left_panel, text="Week Selection", padding=10)
-        week_frame.pack(fill="x", pady=5)
+        # Period selection: one week, or a date range split into buckets
+        period_frame = ttk.LabelFrame(left_panel, text="Period", padding=10)
+        period_frame.pack(fill="x", pady=5)
         
+        self.period_mode = tk.StringVar(value="week")
+        week_row = ttk.Frame(period_frame)
+        week_row.pack(fill="x")
+        ttk.Radiobutton(week_row, text="Weeks ago:", value="week", variable=self.period_mode,
+                        command=self.on_view_change).pack(side="left")
         self.week_offset = tk.IntVar(value=0)
-        ttk.Label(week_frame, text="Weeks ago:").pack(side="left")
-        week_spin = ttk.Spinbox(week_frame, from_=0, to=52, width=5,
-                               textvariable=self.week_offset)
+        week_spin = ttk.Spinbox(week_row, from_=0, to=52, width=5,
+                               textvariable=self.week_offset, command=self.on_view_change)
+        week_spin.bind("<Return>", self.on_view_change)
         week_spin.pack(side="left", padx=5)
         
+        ttk.Radiobutton(period_frame, text="Date range (YYYY-MM-DD):", value="range",
+                        variable=self.period_mode, command=self.on_view_change).pack(anchor="w", pady=(5, 0))
+        today = datetime.now().date()
+        self.range_start = tk.StringVar(value=(today - timedelta(days=today.weekday() + 7 * 11)).isoformat())
+        self.range_end = tk.StringVar(value=today.isoformat())
+        self.range_granularity = tk.StringVar(value="week")
+        range_row = ttk.Frame(period_frame)
+        range_row.pack(fill="x", pady=2)
+        for label, variable in (("From", self.range_start), ("to", self.range_end)):
+            ttk.Label(range_row, text=label).pack(side="left")
+            entry = ttk.Entry(range_row, textvariable=variable, width=11)
+            entry.bind("<Return>", self.on_view_change)
+            entry.pack(side="left", padx=2)
+        granularity_row = ttk.Frame(period_frame)
+        granularity_row.pack(fill="x")
+        ttk.Label(granularity_row, text="By").pack(side="left")
+        granularity_box = ttk.Combobox(granularity_row, textvariable=self.range_granularity,
+                                       values=("day", "week", "month"), state="readonly", width=7)
+        granularity_box.bind("<<ComboboxSelected>>", self.on_view_change)
+        granularity_box.pack(side="left", padx=2)
+        
+        # Time model
+        time_frame = ttk.LabelFrame(left_panel, text="Time Model", padding=10)
+        time_frame.pack(fill="x", pady=5)
+        
+        self.time_model = tk.StringVar(value=self.analyzer.time_model)
+        ttk.Radiobutton(time_frame, text="Sum of visit durations", value="duration",
+                        variable=self.time_model, command=self.on_view_change).pack(anchor="w")
+        ttk.Radiobutton(time_frame, text="Merged visit intervals", value="interval",
+                        variable=self.time_model, command=self.on_view_change).pack(anchor="w")
+        
         # Profile exclusion
         profile_frame = ttk.LabelFrame(left_panel, text="Exclude Profiles", padding=10)
         profile_frame.pack(fill="x", pady=5)
@@ -289,9 +2645,29 @@ class BrowserAnalyzerGUI:
         button_frame = ttk.Frame(left_panel, padding=10)
         button_frame.pack(fill="x", pady=5)
         
-        ttk.Button(button_frame, text="Analyze", command=self.analyze).pack(fill="x", pady=2)
+        self.analyze_button = ttk.Button(button_frame, text="Analyze", command=self.analyze)
+        self.analyze_button.pack(fill="x", pady=2)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_analysis, state="disabled")
+        self.cancel_button.pack(fill="x", pady=2)
         ttk.Button(button_frame, text="Exit", command=self.root.quit).pack(fill="x", pady=2)
         
+        self.watch_enabled = tk.BooleanVar(value=False)
+        self.watch_interval = tk.IntVar(value=60)
+        self.watch_job = None
+        watch_frame = ttk.Frame(left_panel)
+        watch_frame.pack(fill="x", pady=2)
+        ttk.Checkbutton(watch_frame, text="Auto-refresh every", variable=self.watch_enabled,
+                        command=self.toggle_watch).pack(side="left")
+        ttk.Spinbox(watch_frame, from_=5, to=3600, width=5,
+                    textvariable=self.watch_interval).pack(side="left", padx=2)
+        ttk.Label(watch_frame, text="s").pack(side="left")
+        
+        self.show_timing = tk.BooleanVar(value=False)
+        ttk.Checkbutton(left_panel, text="Show timing summary", variable=self.show_timing).pack(anchor="w", pady=2)
+        
+        self.progress = ttk.Progressbar(left_panel, mode="determinate")
+        self.progress.pack(fill="x", pady=5)
+        
         # Right panel for results and charts
         right_panel = ttk.Frame(self.root, padding=10)
         right_panel.pack(side="right", fill="both", expand=True, padx=5, pady=5)
@@ -301,12 +2677,14 @@ class BrowserAnalyzerGUI:
         self.results_text.pack(fill="x", pady=5)
         
         # Charts frame
-        charts_frame = ttk.Frame(right_panel)
-        charts_frame.pack(fill="both", expand=True)
+        self.charts_frame = ttk.Frame(right_panel)
+        self.charts_frame.pack(fill="both", expand=True)
         
-        # Placeholders for charts
-        self.top_sites_canvas = None
-        self.profile_usage_canvas = None
+        # Charts are created on first use and updated in place afterwards
+        self.profile_usage_chart = None
+        self.top_sites_chart = None
+        self.trend_chart = None
+        self.chart_cache = {}
 
     def update_profiles(self):
         try:
@@ -317,58 +2695,101 @@ class BrowserAnalyzerGUI:
                 
             self.analyzer.set_browser(self.browser_var.get())
             self.profile_vars.clear()
-            
-            # Find the profile frame in the left panel
-            for widget in self.root.winfo_children():
-                if isinstance(widget, ttk.Frame):  # This is the left panel
-                    for child in widget.winfo_children():
-                        if isinstance(child, ttk.LabelFrame) and child.cget("text") == "Exclude Profiles":
-                            # Clear existing checkboxes
-                            for grandchild in child.winfo_children():
-                                grandchild.destroy()
-                            
-                            if not self.analyzer.profile_names:
-                                self.results_text.delete(1.0, tk.END)
-                                self.results_text.insert(tk.END, f"No profiles found for {self.browser_var.get()}. Please check if the browser is installed and has profiles.")
-                                return
-                            
-                            # Add new checkboxes for each profile
-                            for profile_num, profile_name in self.analyzer.profile_names.items():
-                                var = tk.BooleanVar()
-                                self.profile_vars[profile_num] = var
-                                ttk.Checkbutton(
-                                    child,
-                                    text=f"{profile_name} (Profile {profile_num})",
-                                    variable=var
-                                ).pack(anchor="w")
-                            break
+            self.rebuild_profile_checkboxes()
         except Exception as e:
             self.results_text.delete(1.0, tk.END)
             self.results_text.insert(tk.END, f"Error updating profiles: {str(e)}")
 
+    def rebuild_profile_checkboxes(self):
+        """Recreate the Exclude Profiles checkboxes for the analyzer's profiles, keeping existing selections"""
+        selected = {num for num, var in self.profile_vars.items() if var.get()}
+        self.profile_vars.clear()
+        # Find the profile frame in the left panel
+        for widget in self.root.winfo_children():
+            if isinstance(widget, ttk.Frame):  # This is the left panel
+                for child in widget.winfo_children():
+                    if isinstance(child, ttk.LabelFrame) and child.cget("text") == "Exclude Profiles":
+                        # Clear existing checkboxes
+                        for grandchild in child.winfo_children():
+                            grandchild.destroy()
+                        
+                        if not self.analyzer.profiles:
+                            self.results_text.delete(1.0, tk.END)
+                            self.results_text.insert(tk.END, f"No profiles found for {self.browser_var.get()}. Please check if the browser is installed and has profiles.")
+                            return
+                        
+                        # Add new checkboxes for each profile
+                        for profile_num in self.analyzer.profiles:
+                            var = tk.BooleanVar(value=profile_num in selected)
+                            self.profile_vars[profile_num] = var
+                            ttk.Checkbutton(
+                                child,
+                                text=f"{self.analyzer.get_profile_name(profile_num)} ({self.analyzer.get_profile_dir(profile_num)})",
+                                variable=var
+                            ).pack(anchor="w")
+                        return
+
+    def get_date_range(self):
+        """Return the (start, end, granularity) of the date range fields; raises ValueError if invalid"""
+        start, end = self.range_start.get().strip(), self.range_end.get().strip()
+        self.analyzer.parse_date_range(start, end)
+        return start, end, self.range_granularity.get()
+
     def update_charts(self):
-        # Clear existing charts
-        if self.top_sites_canvas:
-            self.top_sites_canvas.get_tk_widget().destroy()
-        if self.profile_usage_canvas:
-            self.profile_usage_canvas.get_tk_widget().destroy()
+        with self.analyzer.timings.stage('render_charts'):
+            range_mode = self.period_mode.get() == "range"
+            if range_mode:
+                try:
+                    view = self.get_date_range()
+                except ValueError:
+                    view = None
+            else:
+                view = self.week_offset.get()
+            key = (
+                self.analyzer.browser_type, view, self.analyzer.time_model,
+                tuple(sorted(self.analyzer.excluded_profiles)), self.analyzer.data_version
+            )
+            charts = self.chart_cache.get(key)
+            if charts is None:
+                # Entries for older data versions can never be hit again
+                if any(k[-1] != key[-1] for k in self.chart_cache):
+                    self.chart_cache.clear()
+                if not range_mode:
+                    charts = (
+                        self.analyzer.get_profile_usage_chart(week_offset=view),
+                        self.analyzer.get_top_sites_chart(week_offset=view),
+                    )
+                elif view is None:
+                    charts = (None, None)
+                else:
+                    charts = (
+                        self.analyzer.get_range_usage_chart(*view),
+                        self.analyzer.get_range_trend_chart(*view),
+                    )
+                self.chart_cache[key] = charts
             
-        # Create new charts
-        charts_frame = [f for f in self.root.winfo_children() if isinstance(f, ttk.Frame)][-1]
-        
-        # Profile usage chart (now first)
-        profile_usage_fig = self.analyzer.create_profile_usage_plot(week_offset=self.week_offset.get())
-        if profile_usage_fig:
-            self.profile_usage_canvas = FigureCanvasTkAgg(profile_usage_fig, master=charts_frame)
-            self.profile_usage_canvas.draw()
-            self.profile_usage_canvas.get_tk_widget().pack(fill="both", expand=True, pady=5)
-        
-        # Top sites chart (now second)
-        top_sites_fig = self.analyzer.create_top_sites_plot(week_offset=self.week_offset.get())
-        if top_sites_fig:
-            self.top_sites_canvas = FigureCanvasTkAgg(top_sites_fig, master=charts_frame)
-            self.top_sites_canvas.draw()
-            self.top_sites_canvas.get_tk_widget().pack(fill="both", expand=True, pady=5)
+            # The figures are created once and reused for every later update
+            if self.profile_usage_chart is None:
+                self.profile_usage_chart = ChartView(self.charts_frame)
+                self.top_sites_chart = ChartView(self.charts_frame)
+                self.trend_chart = TrendChartView(self.charts_frame)
+                self.trend_chart.set_visible(False)
+            self.profile_usage_chart.show(charts[0])
+            # The trend takes the place of the top sites chart in range mode
+            self.top_sites_chart.set_visible(not range_mode)
+            self.trend_chart.set_visible(range_mode)
+            (self.trend_chart if range_mode else self.top_sites_chart).show(charts[1])
+
+    def on_view_change(self, *args):
+        """Redraw results and charts for the newly selected period from data already ingested"""
+        try:
+            self.week_offset.get()
+        except tk.TclError:
+            return
+        idle = self.worker is None or not self.worker.is_alive()
+        if idle and self.analysis_state is not None and self.analyzer.has_data():
+            self.analyzer.time_model = self.time_model.get()
+            self.finish_analysis()
 
     def analyze(self):
         try:
@@ -378,60 +2799,534 @@ class BrowserAnalyzerGUI:
                 self.results_text.insert(tk.END, "Please select a browser first")
                 return
             
+            if self.worker is not None and self.worker.is_alive():
+                self.results_text.insert(tk.END, "An analysis is already running")
+                return
+            
             self.results_text.insert(tk.END, "Starting analysis...\n")
-            self.root.update()
             
             # Set browser and update excluded profiles
-            self.analyzer.set_browser(self.browser_var.get())
+            browser = self.browser_var.get()
+            self.analyzer.set_browser(browser)
             excluded = [num for num, var in self.profile_vars.items() if var.get()]
             self.analyzer.set_excluded_profiles(excluded)
-            
-            self.results_text.insert(tk.END, "Analyzing profiles...\n")
-            self.root.update()
-            
-            # Analyze profiles
-            self.analyzer.analyze_all_profiles()
-            
-            if not self.analyzer.history_data:
+            self.analyzer.time_model = self.time_model.get()
+            self.analyzer.enable_timing(self.show_timing.get())
+            self.analyzer.timings.reset()
+            self.start_analysis(browser)
+                
+        except Exception as e:
+            self.show_analysis_error(e)
+
+    def start_analysis(self, browser, quiet=False):
+        """Start a worker that ingests the profiles whose History files changed.
+
+        Unchanged profiles keep their earlier results. With quiet set, the
+        results pane is only rewritten if something actually changed.
+        """
+        # The worker scans with its own analyzers so changing the browser
+        # selection mid-run cannot redirect it
+        scanners = [self.analyzer.for_browser(browser)]
+        if self.all_browsers.get():
+            scanners += [self.analyzer.for_browser(b) for b in self.analyzer.BROWSER_PATHS if b != browser]
+        tasks = [(scanner, profile) for scanner in scanners for profile in scanner.get_profiles_to_scan()]
+        reused = sum(len(scanner.profiles) for scanner in scanners) - len(tasks)
+        self.analysis_state = {
+            'browser': browser,
+            'total': len(tasks),
+            'done': 0,
+            'log': [f"Reused {reused} unchanged profile(s)"] if reused else [],
+            'quiet': quiet,
+        }
+        if not tasks:
+            if not quiet:
+                self.finish_analysis()
+            return
+
+        self.progress.configure(maximum=len(tasks), value=0)
+        self.cancel_event.clear()
+        self.analysis_queue = queue.Queue()
+        self.worker = threading.Thread(
+            target=self.run_analysis,
+            args=(tasks, self.analysis_queue, self.cancel_event),
+            daemon=True
+        )
+        self.worker.start()
+        self.analyze_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.root.after(100, self.poll_analysis)
+
+    def run_analysis(self, tasks, results, cancel_event):
+        """Worker thread: scan profiles and hand each result to the GUI thread.
+
+        After Cancel, profiles that still finish are posted too; the ones
+        interrupted part way come back as None and are left out.
+        """
+        try:
+            for scanner, profile, df, file_stat in self.analyzer.scan_profiles(tasks, cancel_event=cancel_event):
+                if df is None and cancel_event.is_set():
+                    continue
+                results.put(('profile', scanner, profile, df, file_stat))
+            results.put(('done', cancel_event.is_set()))
+        except Exception as e:
+            results.put(('error', e))
+
+    def toggle_watch(self):
+        if self.watch_enabled.get() and self.watch_job is None:
+            self.watch_job = self.root.after(self.get_watch_interval_ms(), self.watch_tick)
+        elif not self.watch_enabled.get() and self.watch_job is not None:
+            self.root.after_cancel(self.watch_job)
+            self.watch_job = None
+
+    def get_watch_interval_ms(self):
+        try:
+            return max(5, int(self.watch_interval.get())) * 1000
+        except (ValueError, tk.TclError):
+            return 60000
+
+    def watch_tick(self):
+        """Re-ingest profiles whose History files changed since the last poll"""
+        self.watch_job = None
+        if not self.watch_enabled.get():
+            return
+        try:
+            browser = self.browser_var.get()
+            idle = self.worker is None or not self.worker.is_alive()
+            if browser and idle and browser == self.analyzer.browser_type and self.analyzer.has_data():
+                names = self.analyzer.load_profile_names()
+                profiles = self.analyzer.discover_profiles()
+                if names != self.analyzer.profile_names or profiles != self.analyzer.profiles:
+                    self.analyzer.profile_names = names
+                    self.analyzer.profiles = profiles
+                    self.rebuild_profile_checkboxes()
+                if self.analyzer.changed_profiles():
+                    self.start_analysis(browser, quiet=True)
+        except Exception as e:
+            print(f"Error during auto-refresh: {str(e)}")
+        self.watch_job = self.root.after(self.get_watch_interval_ms(), self.watch_tick)
+
+    def cancel_analysis(self):
+        self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+
+    def poll_analysis(self):
+        """Apply results posted by the worker; reschedules itself until the run ends"""
+        finished = None
+        try:
+            while True:
+                message = self.analysis_queue.get_nowait()
+                if message[0] == 'profile':
+                    self.add_profile_result(*message[1:])
+                else:
+                    finished = message
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.root.after(100, self.poll_analysis)
+            return
+
+        self.analyze_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+        if finished[0] == 'error':
+            self.show_analysis_error(finished[1])
+        else:
+            self.finish_analysis(cancelled=finished[1])
+
+    def add_profile_result(self, scanner, profile, df, file_stat=None):
+        state = self.analysis_state
+        state['done'] += 1
+        self.progress.configure(value=state['done'])
+        name = scanner.get_profile_name(profile)
+        if scanner.browser_type != state['browser']:
+            name = f"{scanner.browser_type} {name}"
+        if self.analyzer.store_profile_result(profile, df, scanner.browser_type, file_stat):
+            self.analyzer.invalidate_reports()
+            visits = int(df['visits'].sum()) if 'visits' in df.columns else len(df)
+            state['log'].append(f"Analyzed {name} ({visits} visits)")
+        else:
+            state['log'].append(f"No history found for {name}")
+        action = "Refreshing changed profiles" if state['quiet'] else "Analyzing profiles"
+        self.show_results(f"{action}... {state['done']}/{state['total']}")
+
+    def show_results(self, status):
+        """Rewrite the results pane with the progress log and the current billing distribution"""
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, status + "\n")
+        for line in self.analysis_state['log']:
+            self.results_text.insert(tk.END, line + "\n")
+        
+        if self.period_mode.get() == "range":
+            return self.show_range_results()
+        if self.all_browsers.get():
+            billing = self.analyzer.calculate_browsers_billing(week_offset=self.week_offset.get())
+            if billing is None:
+                return False
+            billing = billing.reset_index()
+            self.results_text.insert(tk.END, "\nBilling Distribution Across Browsers:\n\n")
+            self.results_text.insert(tk.END, str(billing[['browser', 'profile_name', 'hours', 'billing_hours']]))
+            return True
+        billing_dist = self.analyzer.calculate_billing_distribution(
+            week_offset=self.week_offset.get()
+        )
+        if billing_dist is not None and not billing_dist.empty:
+            billing_dist = billing_dist.reset_index()
+            self.results_text.insert(tk.END, "\nBilling Distribution:\n\n")
+            self.results_text.insert(tk.END, str(billing_dist[['profile_name', 'hours', 'billing_hours']]))
+            return True
+        return False
+
+    def show_range_results(self):
+        """Append the billing hours of each bucket of the date range to the results pane"""
+        try:
+            start, end, granularity = self.get_date_range()
+            report = self.analyzer.generate_range_report(start, end, granularity)
+        except ValueError as e:
+            self.results_text.insert(tk.END, f"\nInvalid date range: {str(e)}")
+            return True
+        if report is None:
+            return False
+        billing = report.pivot(index='bucket', columns='profile_name', values='billing_hours')
+        billing.index = [self.analyzer.format_bucket(bucket, granularity) for bucket in billing.index]
+        self.results_text.insert(tk.END, f"\nBilling Hours by {granularity.capitalize()}:\n\n")
+        self.results_text.insert(tk.END, billing.to_string())
+        return True
+
+    def finish_analysis(self, cancelled=False):
+        try:
+            if not self.analyzer.has_data():
+                self.results_text.delete(1.0, tk.END)
                 self.results_text.insert(tk.END, "No browsing history found. Please check if:\n")
                 self.results_text.insert(tk.END, "1. The selected browser is installed\n")
                 self.results_text.insert(tk.END, "2. There are profiles with browsing history\n")
                 self.results_text.insert(tk.END, "3. The profiles are not corrupted\n")
                 return
             
-            self.results_text.insert(tk.END, "Calculating billing distribution...\n")
-            self.root.update()
-            
-            # Calculate and display billing distribution
-            billing_dist = self.analyzer.calculate_billing_distribution(
-                week_offset=self.week_offset.get()
-            )
-            
-            if billing_dist is not None and not billing_dist.empty:
-                billing_dist = billing_dist.reset_index()
-                self.results_text.insert(tk.END, "\nBilling Distribution:\n\n")
-                self.results_text.insert(tk.END, str(billing_dist[['profile_name', 'hours', 'billing_hours']]))
-                
-                # Update charts
-                self.results_text.insert(tk.END, "\n\nGenerating charts...\n")
-                self.root.update()
-                self.update_charts()
-                
-                self.results_text.insert(tk.END, "\nAnalysis complete!")
+            if cancelled:
+                status = "Analysis cancelled, showing partial results"
+            elif self.analysis_state and self.analysis_state['quiet']:
+                status = f"Auto-refreshed at {datetime.now().strftime('%H:%M:%S')}"
             else:
+                status = "Analysis complete!"
+            if not self.show_results(status):
                 self.results_text.insert(tk.END, "\nNo data found for the selected period")
+            # Drawn either way so charts from a previous week are not left on screen
+            self.update_charts()
+            
+            if self.show_timing.get():
+                self.results_text.insert(tk.END, "\n\nTiming:\n")
+                self.results_text.insert(tk.END, self.analyzer.timings.format_summary())
                 
         except Exception as e:
-            self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(tk.END, f"Error during analysis: {str(e)}\n")
-            self.results_text.insert(tk.END, "Please make sure:\n")
-            self.results_text.insert(tk.END, "1. The selected browser is installed\n")
-            self.results_text.insert(tk.END, "2. You have permission to access the browser files\n")
-            self.results_text.insert(tk.END, "3. The browser is not currently running\n")
+            self.show_analysis_error(e)
+        finally:
+            if self.startup_probe is not None:
+                # Idle callbacks run after the charts have been drawn
+                self.root.after_idle(self.finish_startup_probe)
+
+    def show_analysis_error(self, e):
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, f"Error during analysis: {str(e)}\n")
+        self.results_text.insert(tk.END, "Please make sure:\n")
+        self.results_text.insert(tk.END, "1. The selected browser is installed\n")
+        self.results_text.insert(tk.END, "2. You have permission to access the browser files\n")
+        self.results_text.insert(tk.END, "3. The browser is not currently running\n")
+
+def parse_profile_arg(analyzer, value):
+    """Resolve a --exclude value given as a number, directory name or profile name"""
+    if value.isdigit():
+        return int(value)
+    profile_num = analyzer.parse_profile_dir(value)
+    if profile_num is not None:
+        return profile_num
+    for profile_num, name in analyzer.profile_names.items():
+        if name == value:
+            return profile_num
+    raise ValueError(f"Unknown profile: {value}")
+
+def write_table(df, path, output_format):
+    if output_format == 'json':
+        df.to_json(path, orient='records', indent=2, date_format='iso')
+    else:
+        df.to_csv(path, index=False)
+    print(f"Wrote {path}")
+
+def apply_analysis_args(analyzer, args):
+    """Copy the analysis settings shared by every command-line mode onto analyzer"""
+    analyzer.report_source = args.report_source
+    analyzer.time_model = args.time_model
+    analyzer.idle_cap_minutes = args.idle_cap
+    if args.compact:
+        analyzer.storage_layout = 'compact'
+    if args.streaming:
+        analyzer.ingest_mode = 'streaming'
+        analyzer.memory_limit_mb = args.memory_limit
+
+def run_fleet(args):
+    """Run the billing calculation for every user under --fleet-dir and write one org-wide table"""
+    analyzer = BrowserHistoryAnalyzer(use_cache=False)
+    analyzer.browser_type = args.browser
+    try:
+        excluded = [parse_profile_arg(analyzer, value) for value in args.exclude]
+    except ValueError as e:
+        print(str(e))
+        return 2
+    analyzer.set_excluded_profiles(excluded)
+    apply_analysis_args(analyzer, args)
+    analyzer.analyze_fleet(args.fleet_dir, max_workers=args.workers)
+
+    report = analyzer.generate_fleet_report(week_offset=args.week_offset)
+    if report is None:
+        print("No data found for the selected period")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_table(report, os.path.join(args.output_dir, f"fleet_billing.{args.format}"), args.format)
+    return 0
+
+def run_browsers(args):
+    """Bill the profiles of all --browsers together and write one table with a browser column"""
+    analyzer = BrowserHistoryAnalyzer(use_cache=not args.no_cache)
+    apply_analysis_args(analyzer, args)
+    analyzer.analyze_browsers(args.browsers)
+    billing = analyzer.calculate_browsers_billing(args.browsers, week_offset=args.week_offset)
+    if billing is None:
+        print("No data found for the selected period")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    billing = billing.reset_index().rename(columns={'visit_time': 'visits'})
+    write_table(billing, os.path.join(args.output_dir, f"billing.{args.format}"), args.format)
+    return 0
+
+def run_headless(args):
+    """Run the billing calculation without the GUI and write the tables to disk"""
+    if args.fleet_dir:
+        return run_fleet(args)
+    if args.browsers:
+        return run_browsers(args)
+    analyzer = BrowserHistoryAnalyzer(use_cache=not args.no_cache)
+    if args.from_parquet:
+        try:
+            analyzer.load_parquet(args.from_parquet, args.browser)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Error loading {args.from_parquet}: {str(e)}")
+            return 1
+    else:
+        analyzer.set_browser(args.browser, args.user_data_dir)
+        if not analyzer.profiles:
+            print(f"No profiles found for {args.browser} in {analyzer.base_path}")
+            return 1
+
+    try:
+        excluded = [parse_profile_arg(analyzer, value) for value in args.exclude]
+    except ValueError as e:
+        print(str(e))
+        return 2
+    analyzer.set_excluded_profiles(excluded)
+    if args.rules:
+        try:
+            analyzer.set_billing_rules(BillingRules.load(args.rules))
+        except (OSError, ValueError) as e:
+            print(f"Error loading {args.rules}: {str(e)}")
+            return 2
+    analyzer.enable_timing(args.timing_json is not None)
+    apply_analysis_args(analyzer, args)
+    if not args.from_parquet:
+        analyzer.analyze_all_profiles()
+    if args.export_parquet:
+        try:
+            analyzer.export_parquet(args.export_parquet)
+        except ImportError as e:
+            print(str(e))
+            return 1
+        print(f"Wrote {args.export_parquet}")
+
+    if args.start:
+        try:
+            report = analyzer.generate_range_report(args.start, args.end or datetime.now().date(), args.granularity)
+        except ValueError as e:
+            print(str(e))
+            return 2
+        if report is None:
+            print("No data found for the selected period")
+            return 1
+        os.makedirs(args.output_dir, exist_ok=True)
+        write_table(report, os.path.join(args.output_dir, f"range_billing.{args.format}"), args.format)
+        return 0
+
+    billing_dist = analyzer.calculate_billing_distribution(week_offset=args.week_offset)
+    total_time, _ = analyzer.generate_time_report(args.week_offset, excluded)
+    if billing_dist is None or total_time is None:
+        print("No data found for the selected period")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    billing_dist = billing_dist.reset_index().rename(columns={'visit_time': 'visits'})
+    top_domains = total_time.head(args.top).reset_index().rename(columns={'visit_time': 'visits'})
+    write_table(billing_dist, os.path.join(args.output_dir, f"billing.{args.format}"), args.format)
+    write_table(top_domains, os.path.join(args.output_dir, f"top_domains.{args.format}"), args.format)
+    if args.rules:
+        buckets = analyzer.generate_bucket_report(week_offset=args.week_offset)
+        if buckets is not None:
+            buckets = buckets.reset_index()
+            write_table(buckets, os.path.join(args.output_dir, f"buckets.{args.format}"), args.format)
+    if args.timing_json:
+        with open(args.timing_json, 'w', encoding='utf-8') as f:
+            f.write(analyzer.get_timing_json())
+        print(f"Wrote {args.timing_json}")
+    return 0
+
+def run_service(args):
+    """Serve reports over HTTP on localhost until interrupted"""
+    analyzer = BrowserHistoryAnalyzer(use_cache=not args.no_cache)
+    analyzer.set_browser(args.browser, args.user_data_dir)
+    if not analyzer.profiles:
+        print(f"No profiles found for {args.browser} in {analyzer.base_path}")
+        return 1
+    try:
+        analyzer.set_excluded_profiles([parse_profile_arg(analyzer, value) for value in args.exclude])
+        if args.rules:
+            analyzer.set_billing_rules(BillingRules.load(args.rules))
+    except (OSError, ValueError) as e:
+        print(str(e))
+        return 2
+    apply_analysis_args(analyzer, args)
+
+    service = ReportService(analyzer, refresh_interval=args.refresh_interval)
+    service.start()
+    server = create_report_server(service, args.host, args.port)
+    print(f"Serving reports on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+    return 0
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Analyze browser history and calculate time distribution across profiles."
+    )
+    parser.add_argument('--headless', action='store_true',
+                        help="run without the GUI and write report files")
+    parser.add_argument('--browser', choices=list(BrowserHistoryAnalyzer.BROWSER_PATHS),
+                        help="browser to analyze (required with --headless)")
+    parser.add_argument('--browsers', type=lambda value: [b.strip() for b in value.split(',') if b.strip()],
+                        metavar='NAMES',
+                        help="with --headless, scan these comma-separated browsers together "
+                             "(e.g. Chrome,Edge) and write billing with a browser column")
+    parser.add_argument('--user-data-dir',
+                        help="use this User Data folder instead of the browser's default location")
+    parser.add_argument('--week-offset', type=int, default=0,
+                        help="number of weeks ago to report on (default: 0, the current week)")
+    parser.add_argument('--start', metavar='YYYY-MM-DD',
+                        help="report on the date range from this day instead of one week; "
+                             "writes range_billing with one row per bucket and profile")
+    parser.add_argument('--end', metavar='YYYY-MM-DD',
+                        help="last day of the --start range (default: today)")
+    parser.add_argument('--granularity', choices=['day', 'week', 'month'], default='week',
+                        help="bucket size for --start ranges (default: week)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='PROFILE',
+                        help="profile number, directory or name to exclude from billing; repeatable")
+    parser.add_argument('--time-model', choices=['duration', 'interval'], default='duration',
+                        help="bill by summed visit durations, or by merged visit intervals "
+                             "so parallel tabs count once (default: duration)")
+    parser.add_argument('--idle-cap', type=float, default=30, metavar='MINUTES',
+                        help="longest time a single visit can count for with --time-model interval "
+                             "(default: 30)")
+    parser.add_argument('--report-source', choices=['memory', 'sql'], default='memory',
+                        help="compute weekly reports from the loaded data, or query each History "
+                             "database for the week; sql only supports --time-model duration "
+                             "(default: memory)")
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv',
+                        help="output file format (default: csv)")
+    parser.add_argument('--output-dir', default='.',
+                        help="directory for billing and top_domains files (default: current directory)")
+    parser.add_argument('--top', type=int, default=10,
+                        help="number of top domains to write (default: 10)")
+    parser.add_argument('--timing-json', metavar='PATH',
+                        help="record per-stage timings and write them to this JSON file")
+    parser.add_argument('--compact', action='store_true',
+                        help="keep visits in the compact layout (integer times and domain codes, no URLs or titles)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="ingest in chunks and keep only aggregates, to bound memory use")
+    parser.add_argument('--memory-limit', type=int, default=256, metavar='MB',
+                        help="approximate memory ceiling for --streaming (default: 256)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="read the full history instead of using the visit cache")
+    parser.add_argument('--startup-probe', metavar='PATH',
+                        help="write the times the window appeared and, with --browser, the first "
+                             "report was shown to PATH as JSON, then exit (see benchmarks/startup.py)")
+    parser.add_argument('--serve', action='store_true',
+                        help="keep the data loaded and serve reports as JSON over HTTP")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address for --serve to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="port for --serve (default: 8765)")
+    parser.add_argument('--refresh-interval', type=float, default=60, metavar='SECONDS',
+                        help="how often --serve re-ingests changed profiles (default: 60)")
+    parser.add_argument('--rules', metavar='PATH',
+                        help="JSON file of billing rules mapping domains and URL paths to buckets; "
+                             "also writes a buckets report")
+    parser.add_argument('--export-parquet', metavar='DIR',
+                        help="also write visits and rollups to DIR as Parquet, partitioned by "
+                             "browser, profile and week (needs pyarrow)")
+    parser.add_argument('--from-parquet', metavar='DIR',
+                        help="report from a --export-parquet folder instead of the browser's databases")
+    parser.add_argument('--fleet-dir', metavar='DIR',
+                        help="with --headless, analyze every user folder collected under DIR "
+                             "and write fleet_billing with a user column")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="worker processes for --fleet-dir (default: one per CPU)")
+    return parser
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.report_source == 'sql':
+        if args.time_model == 'interval':
+            parser.error("--report-source sql cannot be used with --time-model interval")
+        if args.from_parquet or args.fleet_dir:
+            parser.error("--report-source sql reads the browser databases directly")
+    if args.fleet_dir:
+        unsupported = [flag for flag, value in (
+            ('--start', args.start), ('--end', args.end), ('--rules', args.rules),
+            ('--export-parquet', args.export_parquet), ('--from-parquet', args.from_parquet),
+        ) if value]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} cannot be used with --fleet-dir")
+    if args.serve:
+        if not args.browser:
+            parser.error("--browser is required with --serve")
+        return run_service(args)
+    if args.browsers:
+        unknown = [b for b in args.browsers if b not in BrowserHistoryAnalyzer.BROWSER_PATHS]
+        if unknown:
+            parser.error(f"unknown browser: {', '.join(unknown)}")
+        unsupported = [flag for flag, value in (
+            ('--browser', args.browser), ('--user-data-dir', args.user_data_dir), ('--exclude', args.exclude),
+            ('--start', args.start), ('--rules', args.rules), ('--export-parquet', args.export_parquet),
+            ('--from-parquet', args.from_parquet), ('--fleet-dir', args.fleet_dir), ('--serve', args.serve),
+        ) if value]
+        if not args.headless or unsupported:
+            parser.error(f"--browsers needs --headless and cannot be used with {', '.join(unsupported) or 'the GUI'}")
+        return run_headless(args)
+    if args.headless:
+        if not args.browser:
+            parser.error("--browser is required with --headless")
+        return run_headless(args)
 
-def main():
     gui = BrowserAnalyzerGUI()
+    if args.startup_probe:
+        gui.start_startup_probe(args.startup_probe, args.browser)
     gui.root.mainloop()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Fleet worker processes of a frozen build re-run this module, and must
+    # be taken over before main starts the GUI
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import numpy as np
+
+from src.main import BrowserHistoryAnalyzer
+
+def active(starts, durations, idle_cap_minutes=30, carry=None):
+    analyzer = BrowserHistoryAnalyzer(use_cache=False)
+    analyzer.idle_cap_minutes = idle_cap_minutes
+    return analyzer.compute_active_durations(
+        np.array(starts, dtype='int64'), np.array(durations, dtype='int64'), carry
+    ).tolist()
+
+def test_overlapping_visits_are_counted_once():
+    assert active([0, 10, 100], [20, 20, 5]) == [20, 10, 5]
+
+def test_nested_visit_gets_nothing():
+    assert active([0, 5], [100, 10]) == [100, 0]
+
+def test_credits_keep_input_order():
+    assert active([10, 0], [20, 20]) == [10, 20]
+
+def test_durations_are_capped():
+    minute = 60 * 1000000
+    assert active([0, 10 * minute], [120 * minute, 0], idle_cap_minutes=1) == [minute, 0]
+
+def test_empty_input():
+    assert active([], []) == []
+
+def test_chunks_with_carry_match_one_pass():
+    rng = np.random.default_rng(0)
+    starts = np.sort(rng.integers(0, 10 ** 10, size=1000))
+    durations = rng.integers(0, 10 ** 9, size=1000)
+    carry = {}
+    chunked = active(starts[:400], durations[:400], carry=carry) + active(starts[400:], durations[400:], carry=carry)
+
+    assert chunked == active(starts, durations)
+    assert sum(chunked) <= (starts[-1] + durations.max()) - starts[0]
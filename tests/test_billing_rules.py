@@ -0,0 +1,62 @@
+import pytest
+
+from src.main import BillingRules
+
+def test_domain_rule_matches_subdomains():
+    rules = BillingRules({'Client': ['example.com']})
+
+    assert rules.match('example.com') == 'Client'
+    assert rules.match('mail.example.com') == 'Client'
+    assert rules.match('notexample.com') == 'Unassigned'
+
+def test_exact_and_below_rules():
+    rules = BillingRules({'Exact': ['=example.com'], 'Below': ['*.example.com']})
+
+    assert rules.match('example.com') == 'Exact'
+    assert rules.match('www.example.com') == 'Below'
+
+def test_wildcard_matches_one_label():
+    rules = BillingRules({'Api': ['api.*.example.com']})
+
+    assert rules.match('api.eu.example.com') == 'Api'
+    assert rules.match('api.eu.west.example.com') == 'Unassigned'
+    assert rules.match('eu.example.com') == 'Unassigned'
+
+def test_most_specific_rule_wins():
+    rules = BillingRules({'Broad': ['example.com'], 'Mail': ['mail.example.com'], 'Any': ['*.*.example.com']})
+
+    assert rules.match('mail.example.com') == 'Mail'
+    assert rules.match('www.example.com') == 'Broad'
+    assert rules.match('a.b.example.com') == 'Any'
+
+def test_earlier_rule_wins_a_tie():
+    rules = BillingRules()
+    rules.add('example.com', 'First')
+    rules.add('example.com', 'Second')
+
+    assert rules.match('example.com') == 'First'
+
+def test_path_rules_match_whole_segments():
+    rules = BillingRules({'Site': ['example.com'], 'Alpha': ['example.com/alpha']})
+
+    assert rules.match('example.com', '/alpha') == 'Alpha'
+    assert rules.match('www.example.com', '/alpha/page') == 'Alpha'
+    assert rules.match('example.com', '/alphabet') == 'Site'
+    assert rules.resolve('example.com') == (('/alpha', 'Alpha'), ('', 'Site'))
+
+def test_host_is_normalized():
+    rules = BillingRules({'Client': ['Example.com']}, default_bucket='Other')
+
+    assert rules.match('user@EXAMPLE.com:8080') == 'Client'
+    assert rules.match('example.org') == 'Other'
+
+def test_added_rule_clears_memo():
+    rules = BillingRules()
+    assert rules.match('example.com') == 'Unassigned'
+    rules.add('example.com', 'Client')
+
+    assert rules.match('example.com') == 'Client'
+
+def test_invalid_pattern_is_rejected():
+    with pytest.raises(ValueError):
+        BillingRules({'Bad': ['example..com']})
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.generate_history import generate_user_data
+from src.main import BrowserHistoryAnalyzer
+
+@pytest.fixture
+def user_data(tmp_path):
+    path = tmp_path / 'User Data'
+    generate_user_data(str(path), profiles=1, visits=5000, urls=500, domains=50, days=60)
+    return str(path)
+
+def make_analyzer(user_data, cache_path):
+    analyzer = BrowserHistoryAnalyzer(cache_path=cache_path)
+    analyzer.set_browser('Chrome', user_data)
+    return analyzer
+
+def fresh_read(user_data):
+    analyzer = BrowserHistoryAnalyzer(use_cache=False)
+    analyzer.set_browser('Chrome', user_data)
+    return analyzer.analyze_profile(0)
+
+def execute(analyzer, sql, params=()):
+    conn = sqlite3.connect(analyzer.get_profile_path(0))
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_first_sync_caches_every_visit(user_data, tmp_path):
+    analyzer = make_analyzer(user_data, str(tmp_path / 'cache.db'))
+    df = analyzer.analyze_profile(0)
+
+    assert len(df) == len(fresh_read(user_data))
+    _, max_visit_id, _ = analyzer.visit_cache.get_watermark('Chrome', 0)
+    assert max_visit_id == 5000
+
+def test_new_visits_are_merged_into_previous_frame(user_data, tmp_path):
+    analyzer = make_analyzer(user_data, str(tmp_path / 'cache.db'))
+    analyzer.analyze_all_profiles()
+    now = analyzer.datetime_to_chrome_time(analyzer.get_week_bounds()[1])
+    for i in range(3):
+        execute(analyzer, "INSERT INTO visits (url, visit_time, visit_duration) VALUES (1, ?, 1000000)", (now - i,))
+
+    analyzer.enable_timing()
+    analyzer.analyze_all_profiles()
+    stages = {stage['stage']: stage for stage in analyzer.get_timing_profile()['stages']}
+
+    # The new visits plus those still inside CACHE_REFRESH_WINDOW
+    assert 3 <= stages['cache_load']['rows'] < 5000
+    assert 'merge_visits' in stages
+    assert len(analyzer.history_data[0]) == len(fresh_read(user_data))
+
+def test_unchanged_sync_keeps_watermark(user_data, tmp_path):
+    cache_path = str(tmp_path / 'cache.db')
+    make_analyzer(user_data, cache_path).analyze_profile(0)
+    analyzer = make_analyzer(user_data, cache_path)
+    watermark = analyzer.visit_cache.get_watermark('Chrome', 0)
+
+    analyzer.analyze_profile(0)
+
+    assert analyzer.visit_cache.get_watermark('Chrome', 0) == watermark
+
+@pytest.mark.parametrize('delete', [
+    "DELETE FROM visits WHERE id <= 1000",  # oldest visits expired
+    "DELETE FROM visits WHERE id BETWEEN 2000 AND 2500",  # a date range was deleted
+])
+def test_truncated_history_resets_cache(user_data, tmp_path, delete):
+    cache_path = str(tmp_path / 'cache.db')
+    make_analyzer(user_data, cache_path).analyze_profile(0)
+    analyzer = make_analyzer(user_data, cache_path)
+    execute(analyzer, delete)
+
+    df = analyzer.analyze_profile(0)
+
+    assert len(df) == len(fresh_read(user_data))
+    assert analyzer.visit_cache.get_id_range('Chrome', 0, 5000)[1] == len(df)
+
+def test_cleared_history_resets_cache(user_data, tmp_path):
+    cache_path = str(tmp_path / 'cache.db')
+    make_analyzer(user_data, cache_path).analyze_profile(0)
+    analyzer = make_analyzer(user_data, cache_path)
+    execute(analyzer, "DELETE FROM visits")
+    execute(analyzer, "INSERT INTO visits (url, visit_time, visit_duration) VALUES (1, ?, 0)",
+            (analyzer.datetime_to_chrome_time(analyzer.get_week_bounds()[0]),))
+
+    df = analyzer.analyze_profile(0)
+
+    assert len(df) == 1
+    assert analyzer.visit_cache.get_watermark('Chrome', 0)[1] == 5001
+
+def test_merge_without_new_rows_leaves_previous_frame_alone(user_data, tmp_path):
+    analyzer = make_analyzer(user_data, str(tmp_path / 'cache.db'))
+    previous = analyzer.analyze_profile(0)
+    watermark = previous.attrs['cache_watermark']
+
+    merged = analyzer.merge_visits(previous, previous.iloc[:0])
+    merged.attrs['cache_watermark'] = None
+
+    assert merged is not previous
+    assert previous.attrs['cache_watermark'] == watermark